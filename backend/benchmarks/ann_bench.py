@@ -0,0 +1,187 @@
+"""
+Recall and throughput of the IVF passage index against exact search.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.ann_bench --output ann.json
+    python -m backend.benchmarks.ann_bench --count 100000 --n-probes 1 4 16 64
+    python -m backend.benchmarks.ann_bench --vectors backend/models/index/passages-<hash>.npy
+
+Everything runs offline on synthetic embeddings: unit vectors scattered
+around a few dozen broad topic directions, so that, like sentence embeddings
+of a knowledge base, a topic spans several IVF lists and near neighbours
+often sit across a list boundary. `--vectors` benchmarks a persisted .npy
+matrix instead. Queries are stored vectors with noise added, answered one
+at a time like /api/nlp/predict does.
+
+Reported: build time, then recall@k (the share of the exact top-k that the
+index returns) and single-query latency and QPS for exact search and for
+every n_probe. The index is then edited in place, removing and adding a
+slice of the entries, and measured again, so drift from incremental updates
+shows up. Results are written as JSON so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+os.chdir(BACKEND_DIR)  # data/ and models/ paths are relative to the backend folder
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import numpy as np
+
+DEFAULT_N_PROBES = [1, 2, 4, 8, 16, 32]
+
+
+def synthesize_vectors(rng, count: int, dim: int, topics: int, spread: float) -> np.ndarray:
+    """Unit vectors around `topics` random directions; a higher `spread` means looser clusters."""
+    from backend.services.embedding_index import normalize_rows
+
+    centers = normalize_rows(rng.standard_normal((topics, dim)))
+    members = rng.integers(0, topics, count)
+    return normalize_rows(centers[members] + spread * rng.standard_normal((count, dim)) / np.sqrt(dim))
+
+
+def make_queries(rng, vectors: np.ndarray, count: int, noise: float) -> np.ndarray:
+    from backend.services.embedding_index import normalize_rows
+
+    rows = rng.choice(len(vectors), count, replace=len(vectors) < count)
+    base = np.asarray(vectors[rows], dtype=np.float32)
+    return normalize_rows(base + noise * rng.standard_normal(base.shape) / np.sqrt(base.shape[1]))
+
+
+def summarize_timings(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+
+def run_queries(search, queries: np.ndarray) -> tuple:
+    results, samples = [], []
+    for query in queries:
+        start_time = time.perf_counter()
+        results.append([entry_id for entry_id, _ in search(query)])
+        samples.append(time.perf_counter() - start_time)
+    return results, samples
+
+
+def recall_at_k(results: list, truth: list, k: int) -> float:
+    return statistics.mean(len(set(found) & set(expected)) / min(k, len(expected))
+                           for found, expected in zip(results, truth) if expected)
+
+
+def measure(index, queries: np.ndarray, truth: list, k: int, n_probes: list) -> list:
+    report = []
+    for n_probe in n_probes:
+        results, samples = run_queries(lambda query: index.search(query, k, n_probe), queries)
+        latency = summarize_timings(samples)
+        report.append({
+            "n_probe": n_probe,
+            "recall_at_k": recall_at_k(results, truth, k),
+            "latency": latency,
+            "qps": 1000 / latency["mean_ms"],
+        })
+    return report
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50000, help="Synthetic entries")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic dimensions (all-MiniLM-L6-v2 has 384)")
+    parser.add_argument("--topics", type=int, default=50, help="Synthetic topic directions")
+    parser.add_argument("--spread", type=float, default=1.5, help="Synthetic cluster spread")
+    parser.add_argument("--vectors", help="Benchmark this .npy matrix instead of synthetic vectors")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--query-noise", type=float, default=0.5)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=0, help="IVF lists (default: about sqrt(count))")
+    parser.add_argument("--n-probes", nargs="+", type=int, default=DEFAULT_N_PROBES)
+    parser.add_argument("--churn", type=float, default=0.1, help="Share of entries removed and added in the update pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    from backend.services.ann_index import IVFIndex
+
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = np.load(args.vectors, mmap_mode="r")
+        source = args.vectors
+    else:
+        vectors = synthesize_vectors(rng, args.count, args.dim, args.topics, args.spread).astype(args.dtype)
+        source = "synthetic"
+    queries = make_queries(rng, vectors, args.queries, args.query_noise)
+
+    exact = IVFIndex.build(vectors, n_lists=1)
+    start_time = time.perf_counter()
+    index = IVFIndex.build(vectors, n_lists=args.n_lists or None)
+    build_seconds = time.perf_counter() - start_time
+
+    truth, exact_samples = run_queries(lambda query: exact.search(query, args.k), queries)
+    exact_latency = summarize_timings(exact_samples)
+    n_probes = sorted({min(n_probe, index.n_lists) for n_probe in args.n_probes})
+    ivf_report = measure(index, queries, truth, args.k, n_probes)
+
+    # Incremental update: remove a slice of the entries and add as many new ones near the old clusters
+    churn = int(len(vectors) * args.churn)
+    removed = rng.choice(len(vectors), churn, replace=False)
+    added = make_queries(rng, vectors, churn, args.query_noise).astype(vectors.dtype)
+    added_ids = np.arange(len(vectors), len(vectors) + churn)
+    start_time = time.perf_counter()
+    for index_to_update in (exact, index):
+        index_to_update.remove(removed)
+        index_to_update.add(added_ids, added)
+    update_seconds = (time.perf_counter() - start_time) / 2
+    updated_truth, _ = run_queries(lambda query: exact.search(query, args.k), queries)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "vectors": source,
+        "count": int(len(vectors)),
+        "dim": int(vectors.shape[1]),
+        "dtype": str(vectors.dtype),
+        "queries": args.queries,
+        "k": args.k,
+        "n_lists": index.n_lists,
+        "build_seconds": build_seconds,
+        "exact": {"latency": exact_latency, "qps": 1000 / exact_latency["mean_ms"]},
+        "ivf": ivf_report,
+        "after_update": {
+            "removed": churn,
+            "added": churn,
+            "update_seconds": update_seconds,
+            "ivf": measure(index, queries, updated_truth, args.k, n_probes),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Check that an exported inference backend reproduces the PyTorch detections.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.backend_parity --backend onnxruntime --images path/to/images
+
+Every image is classified by the torch model and by the candidate backend.
+The check fails if the detected classes differ, if a per-class confidence
+differs by more than --conf-tol, or if a torch box has no candidate box of
+the same class with IoU >= --iou-tol.
+"""
+import argparse
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+os.chdir(BACKEND_DIR)  # data/ and models/ paths are relative to the backend folder
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ["INFERENCE_BACKEND"] = "torch"
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def boxes_by_class(result) -> dict:
+    grouped = {}
+    for xyxy, cls in zip(result.boxes.xyxy.tolist(), result.boxes.cls.tolist()):
+        grouped.setdefault(int(cls), []).append(xyxy)
+    return grouped
+
+
+def compare(reference, candidate, summarize, conf_tol: float, iou_tol: float) -> list:
+    """Return a list of human-readable mismatches between two YOLO results."""
+    from backend.services.tracking_service import box_iou
+
+    problems = []
+    ref_summary, cand_summary = summarize(reference), summarize(candidate)
+
+    if set(ref_summary) != set(cand_summary):
+        problems.append(f"classes differ: {sorted(ref_summary)} vs {sorted(cand_summary)}")
+    for name in set(ref_summary) & set(cand_summary):
+        diff = abs(ref_summary[name]["confidence"] - cand_summary[name]["confidence"])
+        if diff > conf_tol:
+            problems.append(f"{name}: confidence differs by {diff:.4f}")
+
+    cand_boxes = boxes_by_class(candidate)
+    for cls, ref_list in boxes_by_class(reference).items():
+        for ref_box in ref_list:
+            best = max((box_iou(ref_box, box) for box in cand_boxes.get(cls, [])), default=0.0)
+            if best < iou_tol:
+                problems.append(f"class {cls}: box {[round(v, 1) for v in ref_box]} best IoU {best:.3f}")
+    return problems
+
+
+def main():
+    from backend.config.db_config import settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", required=True, choices=["onnxruntime", "openvino"])
+    parser.add_argument("--images", default=settings.MODEL_CALIBRATION_DIR, help="Directory of test images")
+    parser.add_argument("--int8", action="store_true", help="Compare the INT8 quantized export")
+    parser.add_argument("--conf-tol", type=float, default=0.05)
+    parser.add_argument("--iou-tol", type=float, default=0.9)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if not args.images or not os.path.isdir(args.images):
+        parser.error("--images must point at a directory of test images")
+
+    from backend.services import classification_service
+    from backend.services.image_preprocessing import preprocess_image
+
+    settings.MODEL_INT8 = args.int8
+    candidate_model = classification_service.load_yolo_model(settings.MODEL_PATH, backend=args.backend)
+    reference_model = classification_service.load_yolo_model(settings.MODEL_PATH, backend="torch")
+
+    report = {"backend": args.backend, "int8": args.int8, "images": 0, "failures": {}}
+    for file_name in sorted(os.listdir(args.images)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        with open(os.path.join(args.images, file_name), "rb") as f:
+            img_array = preprocess_image(f.read(), size=settings.IMAGE_SIZE, max_pixels=settings.MAX_IMAGE_PIXELS)
+
+        conf = settings.CONFIDENCE_THRESHOLD
+        reference = reference_model.predict(img_array, conf=conf, verbose=False)[0]
+        candidate = candidate_model.predict(img_array, conf=conf, device="cpu", verbose=False)[0]
+        problems = compare(reference, candidate, classification_service.summarize_result, args.conf_tol, args.iou_tol)
+
+        report["images"] += 1
+        if problems:
+            report["failures"][file_name] = problems
+
+    report["passed"] = report["images"] > 0 and not report["failures"]
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Stage-level micro-benchmarks for the classification pipeline.
+
+Run from the repository root:
+
+    python -m backend.benchmarks.classification_bench --detector stub --output bench.json
+    python -m backend.benchmarks.classification_bench --detector real --batch-sizes 1 8 32
+
+Everything runs offline: images are synthesized in memory at several
+resolutions and formats, and the waste catalog lives in a throwaway SQLite
+database seeded from data/weights.json. The detector is either a stub that
+returns real Ultralytics `Results` after a simulated forward-pass delay, or
+the real weights from MODEL_PATH.
+
+Reported per image format/resolution: decode, resize (letterbox),
+inference, post-processing and enrichment times, plus detector throughput
+at each batch size and peak memory (Python allocations while the
+pipeline runs, plus process RSS). Results are written as JSON so runs can
+be compared across commits.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+os.chdir(BACKEND_DIR)  # data/ and models/ paths are relative to the backend folder
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_RESOLUTIONS = ["640x480", "1920x1080", "4032x3024"]
+DEFAULT_FORMATS = ["JPEG", "PNG"]
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+
+
+class StubDetector:
+    """
+    Stand-in for a YOLO model: sleeps like a forward pass and returns random boxes.
+
+    `base_ms` is paid once per batch and `per_image_ms` per image, which is
+    roughly how batched CPU inference scales.
+    """
+
+    def __init__(self, names: dict, base_ms: float = 20.0, per_image_ms: float = 8.0, boxes_per_image: int = 12, seed: int = 0):
+        self.names = names
+        self.base_ms = base_ms
+        self.per_image_ms = per_image_ms
+        self.boxes_per_image = boxes_per_image
+        self.rng = np.random.default_rng(seed)
+
+    def predict(self, images, **kwargs):
+        import torch
+        from ultralytics.engine.results import Results
+
+        images = images if isinstance(images, list) else [images]
+        time.sleep((self.base_ms + self.per_image_ms * len(images)) / 1000.0)
+
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            n = self.boxes_per_image
+            x1 = self.rng.uniform(0, width * 0.8, n)
+            y1 = self.rng.uniform(0, height * 0.8, n)
+            x2 = np.minimum(x1 + self.rng.uniform(10, width * 0.3, n), width)
+            y2 = np.minimum(y1 + self.rng.uniform(10, height * 0.3, n), height)
+            conf = self.rng.uniform(0.5, 1.0, n)
+            cls = self.rng.integers(0, len(self.names), n)
+            boxes = torch.tensor(np.stack([x1, y1, x2, y2, conf, cls], axis=1), dtype=torch.float32)
+            results.append(Results(image, path="synthetic", names=self.names, boxes=boxes))
+        return results
+
+
+def synthesize_image(width: int, height: int, image_format: str, seed: int = 0) -> bytes:
+    """Smooth gradient plus noise: compresses like a photo rather than like pure noise."""
+    rng = np.random.default_rng(seed)
+    gx = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    gy = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+    base = (gx * np.array([1.0, 0.5, 0.2]) + gy * np.array([0.2, 0.5, 1.0])) / 1.5
+    noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def seed_catalog(session_factory, names: list):
+    """Create the schema in SQLite and add one fully populated waste type per class."""
+    from backend.models.waste_models import WasteType, RecyclingInstructions, DecompositionInfo
+
+    db = session_factory()
+    try:
+        for name in names:
+            waste_type = WasteType(name=name, category="Benchmark")
+            db.add(waste_type)
+            db.flush()
+            db.add(RecyclingInstructions(
+                waste_type_id=waste_type.id,
+                instructions=[{"step": 1, "title": "Rinse", "description": f"Rinse the {name}."}],
+            ))
+            db.add(DecompositionInfo(
+                waste_type_id=waste_type.id,
+                landfill_decomposition={"time": "450 years"},
+                ocean_decomposition={"time": "450 years"},
+                buried_decomposition={"time": "500 years"},
+                open_environment_decomposition={"time": "400 years"},
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def summarize_timings(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "min_ms": ordered[0] * 1000,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--detector", choices=["stub", "real"], default="stub")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, help="WIDTHxHEIGHT values")
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, help="PIL format names, e.g. JPEG PNG")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=20, help="Samples per stage and image")
+    parser.add_argument("--batch-repeats", type=int, default=5, help="Forward passes per batch size")
+    parser.add_argument("--stub-base-ms", type=float, default=20.0)
+    parser.add_argument("--stub-per-image-ms", type=float, default=8.0)
+    parser.add_argument("--output", help="Write the JSON report to this file (default: stdout)")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.config.db_config import settings
+    from backend.models.base import Base
+    from backend.services import classification_service
+    from backend.services.catalog_service import waste_catalog, weights_data
+    from backend.services.image_preprocessing import open_image, letterbox
+
+    # Throwaway SQLite catalog
+    workdir = tempfile.mkdtemp(prefix="sustainaware-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'catalog.db')}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    class_names = list(weights_data) or ["Plastic Bottle", "Paper", "Cardboard"]
+    seed_catalog(session_factory, class_names)
+    db = session_factory()
+    waste_catalog.rebuild(db)
+
+    if args.detector == "stub":
+        model = StubDetector(dict(enumerate(class_names)), args.stub_base_ms, args.stub_per_image_ms)
+        predict = lambda images: model.predict(images)
+    else:
+        model = classification_service.load_yolo_model()
+        classification_service.warmup_yolo_model(model)
+        predict = lambda images: classification_service.predict_batch(model, images)
+
+    tracemalloc.start()
+    size = settings.IMAGE_SIZE
+    stage_report = []
+
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        for image_format in args.formats:
+            image_bytes = synthesize_image(width, height, image_format)
+            timings = {"decode": [], "resize": [], "inference": [], "postprocess": [], "enrichment": []}
+
+            tracemalloc.reset_peak()
+            for _ in range(args.repeats):
+                t0 = time.perf_counter()
+                img = open_image(image_bytes, size, settings.MAX_IMAGE_PIXELS)
+                img.load()
+                t1 = time.perf_counter()
+                img_array = letterbox(img, size)
+                t2 = time.perf_counter()
+                result = predict([img_array])[0]
+                t3 = time.perf_counter()
+                detections = classification_service.summarize_result(result)
+                t4 = time.perf_counter()
+                classification_service.enrich_detections(detections, db)
+                t5 = time.perf_counter()
+
+                for stage, elapsed in zip(timings, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4)):
+                    timings[stage].append(elapsed)
+
+            stage_report.append({
+                "format": image_format,
+                "resolution": resolution,
+                "bytes": len(image_bytes),
+                "stages": {stage: summarize_timings(samples) for stage, samples in timings.items()},
+                "peak_python_bytes": tracemalloc.get_traced_memory()[1],
+            })
+
+    # Detector throughput per batch size on preprocessed inputs
+    sample = letterbox(open_image(synthesize_image(1280, 960, "JPEG"), size, settings.MAX_IMAGE_PIXELS), size)
+    throughput_report = []
+    for batch_size in args.batch_sizes:
+        batch = [sample] * batch_size
+        predict(batch)  # warm-up for this shape
+        samples = []
+        for _ in range(args.batch_repeats):
+            start_time = time.perf_counter()
+            predict(batch)
+            samples.append(time.perf_counter() - start_time)
+        latency = summarize_timings(samples)
+        throughput_report.append({
+            "batch_size": batch_size,
+            "latency": latency,
+            "images_per_second": batch_size / (latency["mean_ms"] / 1000),
+        })
+
+    tracemalloc.stop()
+    db.close()
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "detector": args.detector,
+        "inference_backend": settings.INFERENCE_BACKEND if args.detector == "real" else "stub",
+        "image_size": size,
+        "stages": stage_report,
+        "throughput": throughput_report,
+        "memory": {
+            "peak_python_bytes": max(entry["peak_python_bytes"] for entry in stage_report),
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
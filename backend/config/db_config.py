@@ -1,7 +1,9 @@
 from fastapi import Depends
 from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
-from ..models.base import Base  
+from ..models.base import AppSession, Base  
 from dotenv import load_dotenv
 import os
 import logging
@@ -15,7 +17,132 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Configuration settings
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Derived from DATABASE_URL (asyncpg / aiosqlite) unless set explicitly
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL")
+
+    # Connection pools (in-memory SQLite only uses pre-ping)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
     MODEL_PATH: str = os.getenv("MODEL_PATH", "models/weights/best_model.pt") 
+    CONFIDENCE_THRESHOLD: float = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
+
+    # Inference backend: "torch", "onnxruntime" or "openvino"
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch").lower()
+    MODEL_EXPORT_DIR: str = os.getenv("MODEL_EXPORT_DIR", "models/weights/exported")
+    MODEL_EXPORT_IMGSZ: int = int(os.getenv("MODEL_EXPORT_IMGSZ", 640))
+    MODEL_INT8: bool = os.getenv("MODEL_INT8", "false").lower() == "true"
+    MODEL_CALIBRATION_DIR: str = os.getenv("MODEL_CALIBRATION_DIR")
+    MODEL_CALIBRATION_SIZE: int = int(os.getenv("MODEL_CALIBRATION_SIZE", 200))
+
+    # Load and warm up models at startup instead of on first request
+    MODEL_PRELOAD: bool = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+    # After a failed model load, wait this long before the next attempt (doubling up to the max)
+    MODEL_RETRY_BACKOFF_SECONDS: float = float(os.getenv("MODEL_RETRY_BACKOFF_SECONDS", 5))
+    MODEL_RETRY_BACKOFF_MAX_SECONDS: float = float(os.getenv("MODEL_RETRY_BACKOFF_MAX_SECONDS", 300))
+
+    # Detector hot-swap: poll MODEL_PATH for new weights (0 disables) and shadow traffic sampling
+    MODEL_WATCH_INTERVAL: float = float(os.getenv("MODEL_WATCH_INTERVAL", 0))
+    SHADOW_SAMPLE_RATE: float = float(os.getenv("SHADOW_SAMPLE_RATE", 0.1))
+
+    # Image preprocessing
+    IMAGE_SIZE: int = int(os.getenv("IMAGE_SIZE", 512))
+    MAX_IMAGE_PIXELS: int = int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000))
+
+    # Micro-batching of YOLO inference requests
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", 8))
+    BATCH_MAX_WAIT_MS: float = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+    # Dedicated inference worker pool
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", 8))
+    INFERENCE_QUEUE_SIZE: int = int(os.getenv("INFERENCE_QUEUE_SIZE", 32))
+    INFERENCE_RETRY_AFTER: int = int(os.getenv("INFERENCE_RETRY_AFTER", 1))
+
+    # Bulk classification limits
+    BULK_MAX_IN_FLIGHT: int = int(os.getenv("BULK_MAX_IN_FLIGHT", 16))
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", 10000))
+    BULK_MAX_FILE_BYTES: int = int(os.getenv("BULK_MAX_FILE_BYTES", 25 * 1024 * 1024))
+    # Caps on the uploaded bytes of one request and on the image bytes read from it (after decompression)
+    BULK_MAX_UPLOAD_BYTES: int = int(os.getenv("BULK_MAX_UPLOAD_BYTES", 1024 * 1024 * 1024))
+    BULK_MAX_TOTAL_BYTES: int = int(os.getenv("BULK_MAX_TOTAL_BYTES", 4 * 1024 * 1024 * 1024))
+    # Executor slots all bulk jobs may hold at once (default: half the pool and queue), and how long an item waits for one
+    BULK_EXECUTOR_SLOTS: int = int(os.getenv("BULK_EXECUTOR_SLOTS", max(1, (INFERENCE_WORKERS + INFERENCE_QUEUE_SIZE) // 2)))
+    BULK_MAX_WAIT_SECONDS: float = float(os.getenv("BULK_MAX_WAIT_SECONDS", 30))
+
+    # Video / camera stream classification
+    STREAM_SAMPLE_FPS: float = float(os.getenv("STREAM_SAMPLE_FPS", 5))
+    STREAM_MAX_FRAME_BYTES: int = int(os.getenv("STREAM_MAX_FRAME_BYTES", 5 * 1024 * 1024))
+    STREAM_MAX_UPLOAD_BYTES: int = int(os.getenv("STREAM_MAX_UPLOAD_BYTES", 512 * 1024 * 1024))
+    STREAM_TRACK_IOU: float = float(os.getenv("STREAM_TRACK_IOU", 0.3))
+    STREAM_TRACK_MAX_AGE: int = int(os.getenv("STREAM_TRACK_MAX_AGE", 10))
+    STREAM_TRACK_MIN_HITS: int = int(os.getenv("STREAM_TRACK_MIN_HITS", 2))
+
+    # In-memory waste catalog (0 disables periodic refresh)
+    CATALOG_REFRESH_SECONDS: float = float(os.getenv("CATALOG_REFRESH_SECONDS", 300))
+
+    # Classification result cache ("sha256" or "phash" keys)
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_HASH_MODE: str = os.getenv("RESULT_CACHE_HASH_MODE", "sha256")
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1024))
+    RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 600))
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Server-Timing headers and sampled profiling (0 disables either profiling trigger)
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+    SERVER_TIMING_PATHS: list = os.getenv("SERVER_TIMING_PATHS", "/api/waste/classify/,/api/nlp/predict").split(",")
+    PROFILE_SAMPLE_EVERY: int = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))
+    PROFILE_SLOW_MS: float = float(os.getenv("PROFILE_SLOW_MS", 0))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+
+    # Keyset-paginated listings (records, feedback, users)
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", 50))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", 500))
+
+    # Streaming exports: rows fetched per server-side cursor batch
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+    # Optional write-behind history of classification results into waste_records
+    # (existing databases need `python -m backend.core.migrate_classification_history` first)
+    CLASSIFICATION_HISTORY_ENABLED: bool = os.getenv("CLASSIFICATION_HISTORY_ENABLED", "false").lower() == "true"
+    HISTORY_BATCH_SIZE: int = int(os.getenv("HISTORY_BATCH_SIZE", 500))
+    HISTORY_FLUSH_MS: float = float(os.getenv("HISTORY_FLUSH_MS", 1000))
+    HISTORY_QUEUE_SIZE: int = int(os.getenv("HISTORY_QUEUE_SIZE", 10000))
+
+    # Persisted, memory-mapped knowledge-base embeddings for the NLP model ("float32" or "float16")
+    NLP_INDEX_DIR: str = os.getenv("NLP_INDEX_DIR", "models/index")
+    NLP_INDEX_DTYPE: str = os.getenv("NLP_INDEX_DTYPE", "float32")
+
+    # NLP answers: passages of up to NLP_PASSAGE_WORDS words, QA over the NLP_TOP_K most similar ones
+    NLP_PASSAGE_WORDS: int = int(os.getenv("NLP_PASSAGE_WORDS", 40))
+    NLP_TOP_K: int = int(os.getenv("NLP_TOP_K", 3))
+    NLP_MIN_SIMILARITY: float = float(os.getenv("NLP_MIN_SIMILARITY", 0.35))
+    NLP_QA_MIN_SCORE: float = float(os.getenv("NLP_QA_MIN_SCORE", 0.1))
+
+    # Approximate (IVF) passage search once the knowledge base has NLP_ANN_MIN_ENTRIES passages.
+    # NLP_ANN_LISTS=0 picks about sqrt(passages) lists; a higher NLP_ANN_NPROBE raises recall and latency.
+    NLP_ANN_MIN_ENTRIES: int = int(os.getenv("NLP_ANN_MIN_ENTRIES", 5000))
+    NLP_ANN_LISTS: int = int(os.getenv("NLP_ANN_LISTS", 0))
+    NLP_ANN_NPROBE: int = int(os.getenv("NLP_ANN_NPROBE", 8))
+
+    # NLP caches keyed by the normalized question: query embeddings, and final answers (cleared on knowledge-base edits)
+    NLP_CACHE_ENABLED: bool = os.getenv("NLP_CACHE_ENABLED", "true").lower() == "true"
+    NLP_EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("NLP_EMBEDDING_CACHE_MAX_ENTRIES", 4096))
+    NLP_EMBEDDING_CACHE_TTL_SECONDS: float = float(os.getenv("NLP_EMBEDDING_CACHE_TTL_SECONDS", 3600))
+    NLP_ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("NLP_ANSWER_CACHE_MAX_ENTRIES", 1024))
+    NLP_ANSWER_CACHE_TTL_SECONDS: float = float(os.getenv("NLP_ANSWER_CACHE_TTL_SECONDS", 600))
+    NLP_CACHE_MAX_BYTES: int = int(os.getenv("NLP_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Semantic answer cache: reuse the answer of a recent question at least this cosine-similar.
+    # NLP_SEMANTIC_CACHE_AUDIT_RATE of the hits are re-answered in the background to sample false hits.
+    NLP_SEMANTIC_CACHE_ENABLED: bool = os.getenv("NLP_SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    NLP_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("NLP_SEMANTIC_CACHE_THRESHOLD", 0.9))
+    NLP_SEMANTIC_CACHE_MAX_ENTRIES: int = int(os.getenv("NLP_SEMANTIC_CACHE_MAX_ENTRIES", 1024))
+    NLP_SEMANTIC_CACHE_TTL_SECONDS: float = float(os.getenv("NLP_SEMANTIC_CACHE_TTL_SECONDS", 600))
+    NLP_SEMANTIC_CACHE_AUDIT_RATE: float = float(os.getenv("NLP_SEMANTIC_CACHE_AUDIT_RATE", 0.05))
 
     def validate(self):
         if not self.DATABASE_URL:
@@ -26,16 +153,49 @@ class Settings:
 settings = Settings()
 settings.validate()
 
-# Create database engine
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+def to_async_url(database_url: str) -> URL:
+    """Swap the driver of a database URL for its asyncio counterpart."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    if backend == "postgresql" and "sslmode" in url.query:
+        # asyncpg spells libpq's sslmode as ssl
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+def engine_options(url: URL) -> dict:
+    """Pool settings for an engine; in-memory SQLite uses a single shared connection."""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Create database engines: sync for the inference worker threads, async for the API routers
 try:
-    engine = create_engine(settings.DATABASE_URL)
-    logging.info("Database engine created successfully.")
+    sync_url = make_url(settings.DATABASE_URL)
+    engine = create_engine(sync_url, **engine_options(sync_url))
+    async_url = make_url(settings.ASYNC_DATABASE_URL) if settings.ASYNC_DATABASE_URL else to_async_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    logging.info("Database engines created successfully.")
 except Exception as e:
     logging.error(f"Error creating database engine: {e}")
     raise
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factories
+SessionLocal = sessionmaker(class_=AppSession, autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit, since async sessions cannot lazily refresh them
+AsyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=AppSession, autoflush=False, expire_on_commit=False)
 
 # Dependency to get database session
 def get_db():
@@ -49,6 +209,16 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get an async database session
+async def get_async_db():
+    """Provide an async database session for dependency injection."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logging.error(f"Database session error: {e}")
+            raise
+
 # Debugging: Check database connection
 def check_database():
     """Check if the database is accessible and print existing tables."""
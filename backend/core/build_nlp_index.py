@@ -0,0 +1,32 @@
+"""
+Precompute the NLP passage embedding index, e.g. while building a deployment image.
+
+Run from the repository root:
+
+    python -m backend.core.build_nlp_index
+
+The API then memory-maps the index at startup instead of embedding the
+knowledge base, along with the IVF lists once the knowledge base has
+NLP_ANN_MIN_ENTRIES passages. It rebuilds on its own whenever data/context.json or the
+embedding model changes, so running this is an optimization, not a
+requirement.
+"""
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)  # Data and model paths are relative to the backend folder
+
+from ..services.nlp_service import NLPModel
+
+
+def main():
+    model = NLPModel()
+    manifest = model.passage_index.manifest
+    print(f"Passage index: {manifest['count']} x {manifest['dim']} {manifest['dtype']}, hash {manifest['content_hash'][:16]}")
+    search = model.passage_search
+    print(f"Passage search: {search.n_lists} list(s), n_probe {min(search.n_probe, search.n_lists)}"
+          + (" (exact)" if search.n_lists == 1 else ""))
+
+
+if __name__ == "__main__":
+    main()
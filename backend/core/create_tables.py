@@ -7,3 +7,10 @@ from models.waste_models import WasteType, RecyclingInstructions, DecompositionI
 print("Creating tables...")
 Base.metadata.create_all(engine)  
 print("Tables created successfully!")
+
+# create_all skips tables that already exist, so add any indexes they are missing
+print("Creating missing indexes...")
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+print("Indexes created successfully!")
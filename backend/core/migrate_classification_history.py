@@ -0,0 +1,56 @@
+"""
+Add the classification history columns to an existing waste_records table.
+
+Run from the repository root:
+
+    python -m backend.core.migrate_classification_history
+
+Adds user_id, confidence, item_count and model_version (all nullable, so
+existing rows are untouched) and the (user_id, created_at, id) index behind
+/api/waste/history. On PostgreSQL, created_at's server default is switched
+from the server's local time to UTC, the clock every other writer uses.
+Safe to re-run.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from ..config.db_config import engine
+from ..models.waste_models import WasteRecord
+
+logging.basicConfig(level=logging.INFO)
+
+HISTORY_COLUMNS = ("user_id", "confidence", "item_count", "model_version")
+
+
+def add_history_columns():
+    table = WasteRecord.__table__
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as connection:
+        for name in HISTORY_COLUMNS:
+            if name in existing:
+                continue
+            column_type = table.c[name].type.compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+            logging.info(f"Added {table.name}.{name}")
+        if engine.dialect.name == "postgresql":
+            connection.execute(text(
+                "DO $$ BEGIN "
+                "ALTER TABLE waste_records ADD CONSTRAINT fk_waste_records_user_id "
+                "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE SET NULL; "
+                "EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+            ))
+            connection.execute(text(
+                "ALTER TABLE waste_records ALTER COLUMN created_at SET DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)"
+            ))
+
+
+def main():
+    add_history_columns()
+    for index in WasteRecord.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    logging.info("Classification history migration complete")
+
+
+if __name__ == "__main__":
+    main()
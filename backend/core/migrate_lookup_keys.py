@@ -0,0 +1,142 @@
+"""
+Add normalized lookup keys and waste aliases to an existing database.
+
+Run from the repository root:
+
+    python -m backend.core.migrate_lookup_keys
+    python -m backend.core.migrate_lookup_keys --trigram --yolo-labels
+
+Steps, each safe to re-run:
+
+1. create the waste_aliases table
+2. add waste_types.lookup_key and backfill it from the names
+3. create the unique lookup-key indexes (aborts if two names normalize to the same key)
+4. --trigram (PostgreSQL): pg_trgm GIN indexes for the substring search endpoint
+5. --yolo-labels: alias every detector class label that only matched a waste
+   type through the old ILIKE '%label%' lookup, so it resolves by index instead
+"""
+import argparse
+import logging
+import os
+import sys
+from collections import defaultdict
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import Session
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(BACKEND_DIR)  # Model paths in the settings are relative to the backend folder
+
+from ..config.db_config import engine, settings
+from ..models.base import Base
+from ..models.waste_models import WasteType, WasteAlias
+from ..utils.lookup_keys import normalize_waste_name
+
+logging.basicConfig(level=logging.INFO)
+
+TRIGRAM_INDEXES = {
+    "ix_waste_types_lookup_key_trgm": "waste_types",
+    "ix_waste_aliases_lookup_key_trgm": "waste_aliases",
+}
+
+
+def add_lookup_key_column():
+    columns = {column["name"] for column in inspect(engine).get_columns("waste_types")}
+    if "lookup_key" not in columns:
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE waste_types ADD COLUMN lookup_key VARCHAR(255)"))
+        logging.info("Added waste_types.lookup_key")
+
+
+def backfill_lookup_keys():
+    """Recompute every key, so rows also pick up changes to the normalization rules."""
+    with engine.begin() as connection:
+        rows = connection.execute(text("SELECT id, name, lookup_key FROM waste_types")).all()
+        keys = defaultdict(list)
+        updated = 0
+        for row_id, name, lookup_key in rows:
+            key = normalize_waste_name(name)
+            keys[key].append(name)
+            if key != lookup_key:
+                connection.execute(
+                    text("UPDATE waste_types SET lookup_key = :key WHERE id = :id"), {"key": key, "id": row_id}
+                )
+                updated += 1
+    logging.info(f"Backfilled {updated} of {len(rows)} lookup keys")
+
+    collisions = {key: names for key, names in keys.items() if len(names) > 1}
+    if collisions:
+        for key, names in collisions.items():
+            logging.error(f"Waste types {names} all normalize to '{key}'")
+        sys.exit("Rename or merge the waste types above, then run the migration again.")
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE waste_types ALTER COLUMN lookup_key SET NOT NULL"))
+
+
+def create_indexes():
+    for index in list(WasteType.__table__.indexes) + list(WasteAlias.__table__.indexes):
+        index.create(engine, checkfirst=True)
+    logging.info("Lookup-key indexes are in place")
+
+
+def create_trigram_indexes():
+    if engine.dialect.name != "postgresql":
+        logging.warning("Trigram indexes need PostgreSQL; skipping")
+        return
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for index_name, table in TRIGRAM_INDEXES.items():
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin (lookup_key gin_trgm_ops)"
+            ))
+    logging.info("Trigram indexes are in place")
+
+
+def alias_yolo_labels():
+    """Turn the detector labels that relied on partial-name matching into explicit aliases."""
+    from ultralytics import YOLO
+
+    labels = YOLO(settings.MODEL_PATH).names.values()
+    with Session(engine) as db:
+        waste_types = db.execute(select(WasteType)).scalars().all()
+        taken = {waste.lookup_key for waste in waste_types}
+        taken.update(db.execute(select(WasteAlias.lookup_key)).scalars().all())
+
+        for label in labels:
+            key = normalize_waste_name(label)
+            if not key or key in taken:
+                continue
+            # Same rule the ILIKE '%label%' query applied, but only when it is unambiguous
+            matches = [waste for waste in waste_types if key in waste.lookup_key]
+            if len(matches) == 1:
+                db.add(WasteAlias(waste_type_id=matches[0].id, alias=label, source="yolo"))
+                taken.add(key)
+                logging.info(f"Aliased YOLO label '{label}' to '{matches[0].name}'")
+            elif matches:
+                logging.warning(f"YOLO label '{label}' matches {[w.name for w in matches]}; add an alias by hand")
+            else:
+                logging.warning(f"YOLO label '{label}' matches no waste type")
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trigram", action="store_true", help="Create pg_trgm indexes (PostgreSQL only)")
+    parser.add_argument("--yolo-labels", action="store_true", help=f"Alias the class labels of {settings.MODEL_PATH}")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine, tables=[WasteAlias.__table__])
+    add_lookup_key_column()
+    backfill_lookup_keys()
+    create_indexes()
+    if args.trigram:
+        create_trigram_indexes()
+    if args.yolo_labels:
+        alias_yolo_labels()
+    logging.info("Lookup-key migration complete")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Recompute the daily waste statistics rollup from the raw waste records.
+
+Run from the repository root after bulk imports, manual SQL edits or a
+restore, anything that changed waste_records without going through the ORM:
+
+    python -m backend.core.rebuild_waste_stats
+
+Days are UTC dates: created_at holds naive UTC timestamps.
+"""
+from sqlalchemy.orm import Session
+
+from ..config.db_config import engine
+from ..models.base import Base
+from ..models.waste_models import WasteDailyStats
+from ..services.stats_service import rebuild_waste_stats
+
+
+def main():
+    Base.metadata.create_all(engine, tables=[WasteDailyStats.__table__])
+    with Session(engine) as db:
+        rebuild_waste_stats(db)
+
+
+if __name__ == "__main__":
+    main()
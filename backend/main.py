@@ -1,5 +1,8 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 # Import routers
@@ -9,9 +12,75 @@ from .routers.feedback import router as feedback_router
 from .routers.waste_classification import router as classification_router
 from .routers.nlp import router as nlp_router  
 from .routers.users import router as user_router
+from .services.inference_executor import inference_executor
+from .services import classification_service
+from .services.catalog_service import waste_catalog
+from .services.history_service import classification_history
+from .services.nlp_service import shutdown_semantic_audits
+from .services.model_registry import model_registry
+from .services.metrics_service import metrics, MetricsMiddleware
+from .services.timing_service import ServerTimingMiddleware
+from .config.db_config import SessionLocal, engine, async_engine, settings
+import logging
+
+def preload_waste_catalog():
+    """Load the waste catalog so the first classification does not pay for it."""
+    db = SessionLocal()
+    try:
+        waste_catalog.rebuild(db)
+    except Exception as e:
+        logging.error(f"Error preloading waste catalog: {e}")
+    finally:
+        db.close()
+
+def pool_metric(read):
+    """Read a statistic from both connection pools; pools without it (e.g. SQLite's) report nothing."""
+    def collect():
+        values = {}
+        for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+            try:
+                values[(name,)] = read(pool)
+            except AttributeError:
+                pass
+        return values
+    return collect
+
+metrics.gauge_callback("sustainaware_db_pool_size", "Configured size of the DB connection pool.",
+                       pool_metric(lambda pool: pool.size()), ("engine",))
+metrics.gauge_callback("sustainaware_db_pool_checked_out", "DB connections currently checked out.",
+                       pool_metric(lambda pool: pool.checkedout()), ("engine",))
+metrics.gauge_callback("sustainaware_db_pool_overflow", "DB connections opened beyond the pool size.",
+                       pool_metric(lambda pool: max(0, pool.overflow())), ("engine",))
+
+def log_model_loading(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logging.error(f"Error preloading models: {task.exception()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(preload_waste_catalog)
+    await asyncio.to_thread(classification_history.check_schema)
+    # Load and warm up models in the background; /health answers meanwhile and /ready reports progress
+    if settings.MODEL_PRELOAD:
+        app.state.model_loading = asyncio.create_task(asyncio.to_thread(model_registry.load_all))
+        app.state.model_loading.add_done_callback(log_model_loading)
+    classification_service.detector_manager.start_watching(
+        settings.MODEL_PATH, settings.MODEL_WATCH_INTERVAL, settings.MODEL_RETRY_BACKOFF_MAX_SECONDS
+    )
+    yield
+    # Loading runs in a worker thread that cannot be interrupted, so let it finish before tearing down
+    model_loading = getattr(app.state, "model_loading", None)
+    if model_loading:
+        await asyncio.gather(model_loading, return_exceptions=True)
+    # Drain in-flight classifications before the detectors stop
+    await asyncio.to_thread(inference_executor.shutdown, True)
+    classification_service.detector_manager.shutdown()
+    await asyncio.to_thread(shutdown_semantic_audits, True)
+    await asyncio.to_thread(classification_history.close)
+    await async_engine.dispose()
 
 # Initialize FastAPI app
-app = FastAPI(title="SustainaWare API", version="1.0.0")
+app = FastAPI(title="SustainaWare API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,7 +88,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],
 )
+app.add_middleware(MetricsMiddleware)
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(
+        ServerTimingMiddleware,
+        paths=settings.SERVER_TIMING_PATHS,
+        sample_every=settings.PROFILE_SAMPLE_EVERY,
+        slow_ms=settings.PROFILE_SLOW_MS,
+        profile_dir=settings.PROFILE_DIR,
+        interval_ms=settings.PROFILE_INTERVAL_MS,
+    )
 
 # Root endpoint
 @app.get("/", tags=["General"])
@@ -34,6 +114,20 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=500, detail="Health check failed")
 
+# Readiness probe: ready once every model is loaded and warmed up
+@app.get("/ready", tags=["General"])
+async def readiness_check():
+    ready = model_registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "models": model_registry.status()}
+    )
+
+# Prometheus scrape endpoint
+@app.get("/metrics", tags=["General"], include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Register Routers
 app.include_router(auth_router, prefix="/api", tags=["Authentication"])
 app.include_router(waste_router, prefix="/api", tags=["Waste Management"])
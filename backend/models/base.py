@@ -1,4 +1,5 @@
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session
 import logging
 
 # Set up logging
@@ -14,4 +15,13 @@ It provides a common structure and allows the use of declarative syntax.
 
 # Base class for models
 Base = declarative_base()
+
+
+class AppSession(Session):
+    """
+    Session class of the app's session factories.
+
+    Model event hooks (e.g. the daily statistics rollup) listen on this class
+    rather than on Session, so they do not run for every session in the process.
+    """
 logger.info("SQLAlchemy base model initialized successfully.")
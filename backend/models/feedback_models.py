@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, ForeignKey, Text, DateTime, CheckConstraint, Float
+from sqlalchemy import Column, ForeignKey, Text, DateTime, CheckConstraint, Float, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -16,7 +16,12 @@ class UserFeedback(Base):
 
     user = relationship('User', backref="feedbacks", lazy='joined')
 
-    __table_args__ = (CheckConstraint('rating >= 1.0 AND rating <= 5.0', name='valid_rating_range'),)
+    __table_args__ = (
+        CheckConstraint('rating >= 1.0 AND rating <= 5.0', name='valid_rating_range'),
+        # Keyset pagination: newest first, overall or per user
+        Index('ix_user_feedback_timestamp_id', 'timestamp', 'id'),
+        Index('ix_user_feedback_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),
+    )
 
     def __repr__(self) -> str:
         return f"<UserFeedback(user_id={self.user_id}, rating={self.rating})>"
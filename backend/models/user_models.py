@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Text
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -21,6 +21,9 @@ class User(Base):
     verification_token = Column(String(255), nullable=True, unique=True)  
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Keyset pagination of the user listing
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
+
     def __repr__(self) -> str:
         return f"<User(id={self.id}, name={self.name}, email={self.email}, is_admin={self.is_admin})>"
 
@@ -1,8 +1,41 @@
 import uuid 
-from sqlalchemy import Column, String, Index, DateTime, func, ForeignKey, Float, JSON
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import Column, String, Index, DateTime, Date, Integer, ForeignKey, Float, JSON, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-from .base import Base
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship, validates, column_property
+from sqlalchemy.sql.expression import FunctionElement
+from .base import AppSession, Base
+from ..utils.lookup_keys import normalize_waste_name
+
+
+class utc_now(FunctionElement):
+    """
+    The database's current time in UTC, as a naive timestamp.
+
+    Timestamps are stored as naive UTC everywhere, matching the
+    datetime.utcnow() the application sets, so rows written from raw SQL
+    land on the same clock as rows from the ORM.
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _utc_now_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"  # UTC on SQLite
+
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utc_now, "mssql")
+def _utc_now_mssql(element, compiler, **kw):
+    return "GETUTCDATE()"
 
 
 # ---------------------- WasteType Model ----------------------
@@ -11,17 +44,26 @@ class WasteType(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), unique=True, nullable=False, index=True)
+    # normalize_waste_name(name), kept in sync by the validator below
+    lookup_key = Column(String(255), nullable=False)
     category = Column(String(50), nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=utc_now())
 
     recycling_instructions = relationship("RecyclingInstructions", back_populates="waste_type", uselist=False)
     decomposition_info = relationship("DecompositionInfo", back_populates="waste_type", uselist=False)
     waste_records = relationship("WasteRecord", back_populates="waste_type")
+    aliases = relationship("WasteAlias", back_populates="waste_type", cascade="all, delete-orphan")
 
     __table_args__ = (
         Index('ix_waste_name', 'name'),
+        Index('ix_waste_types_lookup_key', 'lookup_key', unique=True),
     )
 
+    @validates("name")
+    def _set_lookup_key(self, key, name):
+        self.lookup_key = normalize_waste_name(name)
+        return name
+
     def __repr__(self):
         return f"<WasteType(id={str(self.id)}, name={self.name}, category={self.category}, created_at={self.created_at})>"
 
@@ -29,6 +71,37 @@ class WasteType(Base):
         orm_mode = True
 
 
+# ---------------------- WasteAlias Model ----------------------
+class WasteAlias(Base):
+    """Another name for a waste type: a YOLO class label or a synonym."""
+    __tablename__ = 'waste_aliases'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    waste_type_id = Column(UUID(as_uuid=True), ForeignKey('waste_types.id', ondelete="CASCADE"), nullable=False)
+    alias = Column(String(255), nullable=False)
+    lookup_key = Column(String(255), nullable=False)
+    source = Column(String(20), nullable=False, default="synonym")  # "yolo" or "synonym"
+    created_at = Column(DateTime, server_default=utc_now())
+
+    waste_type = relationship("WasteType", back_populates="aliases")
+
+    __table_args__ = (
+        Index('ix_waste_aliases_lookup_key', 'lookup_key', unique=True),
+        Index('ix_waste_aliases_waste_type_id', 'waste_type_id'),
+    )
+
+    @validates("alias")
+    def _set_lookup_key(self, key, alias):
+        self.lookup_key = normalize_waste_name(alias)
+        return alias
+
+    def __repr__(self):
+        return f"<WasteAlias(id={str(self.id)}, alias={self.alias}, source={self.source}, waste_type_id={str(self.waste_type_id)})>"
+
+    class Config:
+        orm_mode = True
+
+
 # ------------------- RecyclingInstructions Model -------------------
 class RecyclingInstructions(Base):
     __tablename__ = 'recycling_instructions'
@@ -80,19 +153,131 @@ class WasteRecord(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     waste_name = Column(String(255), nullable=False)
-    waste_category = Column(String(50), nullable=False)
-    estimated_weight = Column(Float, nullable=True)
+    # active_history: the daily rollup needs the old values of changed records
+    waste_category = column_property(Column(String(50), nullable=False), active_history=True)
+    estimated_weight = column_property(Column(Float, nullable=True), active_history=True)
     recycling_instructions = Column(String(1000), nullable=True)
     soil_decomposition = Column(String(500), nullable=True)
     water_decomposition = Column(String(500), nullable=True)
     landfill_decomposition = Column(String(500), nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Set client-side too, so the daily rollup knows a new record's day without a round-trip
+    created_at = column_property(Column(DateTime, default=datetime.utcnow, server_default=utc_now()), active_history=True)
     waste_type_id = Column(UUID(as_uuid=True), ForeignKey('waste_types.id'), nullable=True)
 
+    # Filled in for records written from classification results
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete="SET NULL"), nullable=True)
+    confidence = Column(Float, nullable=True)
+    item_count = Column(Integer, nullable=True)
+    model_version = Column(String(255), nullable=True)
+
     waste_type = relationship("WasteType", back_populates="waste_records")
 
+    # Keyset pagination: newest first, optionally within one category or for one user
+    __table_args__ = (
+        Index("ix_waste_records_created_at_id", "created_at", "id"),
+        Index("ix_waste_records_category_created_at_id", "waste_category", "created_at", "id"),
+        Index("ix_waste_records_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<WasteRecord(id={str(self.id)}, waste_name={self.waste_name}, waste_category={self.waste_category}, estimated_weight={self.estimated_weight})>"
 
     class Config:
         orm_mode = True
+
+
+# ------------------- WasteDailyStats Rollup -------------------
+class WasteDailyStats(Base):
+    """Record count and total estimated weight per category per day, maintained on every flush."""
+    __tablename__ = 'waste_daily_stats'
+
+    day = Column(Date, primary_key=True)
+    waste_category = Column(String(50), primary_key=True)
+    record_count = Column(Integer, nullable=False, default=0)
+    total_weight = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<WasteDailyStats(day={self.day}, waste_category={self.waste_category}, record_count={self.record_count}, total_weight={self.total_weight})>"
+
+    class Config:
+        orm_mode = True
+
+
+def _rollup_key(record: WasteRecord, old: bool = False):
+    """
+    (day, category) and weight of a record, before (`old`) or after its pending
+    changes. The key is None for a record without a created_at (legacy rows),
+    which the rollup leaves out, as rebuild_waste_stats does.
+    """
+    state = inspect(record)
+    values = {}
+    for name in ("created_at", "waste_category", "estimated_weight"):
+        history = state.attrs[name].history
+        if old and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(record, name)
+    if values["created_at"] is None:
+        return None, 0.0
+    return (values["created_at"].date(), values["waste_category"]), values["estimated_weight"] or 0.0
+
+
+def upsert_daily_stats(connection, deltas: dict):
+    """Add {(day, category): [count, weight]} deltas to the rollup in one statement."""
+    rows = [
+        {"day": day, "waste_category": category, "record_count": count, "total_weight": weight}
+        for (day, category), (count, weight) in deltas.items()
+        if count or weight
+    ]
+    if not rows:
+        return
+    table = WasteDailyStats.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = (postgresql if dialect == "postgresql" else sqlite).insert(table).values(rows)
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.waste_category],
+            set_={
+                "record_count": table.c.record_count + insert.excluded.record_count,
+                "total_weight": table.c.total_weight + insert.excluded.total_weight,
+            },
+        ))
+        return
+    for row in rows:  # Other databases: update, then insert when the day is new
+        updated = connection.execute(
+            table.update()
+            .where(table.c.day == row["day"], table.c.waste_category == row["waste_category"])
+            .values(record_count=table.c.record_count + row["record_count"],
+                    total_weight=table.c.total_weight + row["total_weight"])
+        )
+        if updated.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+@event.listens_for(AppSession, "before_flush")
+def _update_daily_stats(session, flush_context, instances):
+    """Apply the pending waste record inserts, updates and deletes to the rollup in the same transaction."""
+    deltas = defaultdict(lambda: [0, 0.0])
+
+    def apply(record, sign, old=False):
+        key, weight = _rollup_key(record, old)
+        if key is None:
+            return
+        deltas[key][0] += sign
+        deltas[key][1] += sign * weight
+
+    for record in session.new:
+        if isinstance(record, WasteRecord):
+            if record.created_at is None:
+                record.created_at = datetime.utcnow()
+            apply(record, 1)
+    for record in session.deleted:
+        if isinstance(record, WasteRecord):
+            apply(record, -1, old=True)
+    for record in session.dirty:
+        if isinstance(record, WasteRecord) and session.is_modified(record):
+            apply(record, -1, old=True)
+            apply(record, 1)
+
+    if deltas:
+        upsert_daily_stats(session.connection(), deltas)
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from PIL import Image
-from ..config.db_config import get_db
+from ..config.db_config import get_async_db
 from ..schemas.auth_schemas import (
     UserCreate, UserLogin, UserResponse, GoogleAuthRequest, VerifyCodeRequest, ForgotPasswordRequest, ResetPasswordRequest
 )
@@ -12,6 +13,7 @@ from ..services.auth_service import (
 )
 from ..models.user_models import User
 from dotenv import load_dotenv
+import asyncio
 import os
 import shutil
 import uuid
@@ -26,11 +28,11 @@ if not GOOGLE_CLIENT_ID:
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def register(user: UserCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user with the given information and return a JWT token.
     """
-    new_user = register_user(user, background_tasks, db)
+    new_user = await register_user(user, background_tasks, db)
 
     token = create_access_token(
         data={"user_id": str(new_user.id), "email": new_user.email, "name": new_user.name}
@@ -50,11 +52,11 @@ async def register(user: UserCreate, background_tasks: BackgroundTasks, db: Sess
 
 
 @router.post("/login", status_code=status.HTTP_200_OK)
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate a user and return a JWT token.
     """
-    token = login_user(user, db)  
+    token = await login_user(user, db)  
 
     return {
         "success": True,
@@ -68,12 +70,13 @@ async def login(user: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.post("/google-login", status_code=status.HTTP_200_OK)
-async def google_login(payload: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_login(payload: GoogleAuthRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate user using Google OAuth and return a JWT token.
     """
     try:
-        idinfo = id_token.verify_oauth2_token(payload.token, requests.Request())
+        # Fetches Google's signing certificates over HTTP, so run it off the event loop
+        idinfo = await asyncio.to_thread(id_token.verify_oauth2_token, payload.token, requests.Request())
         if idinfo["aud"] != GOOGLE_CLIENT_ID:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Google token: Client ID mismatch")
         
@@ -81,12 +84,13 @@ async def google_login(payload: GoogleAuthRequest, db: Session = Depends(get_db)
         name = idinfo.get("name", "Google User")
         avatar = idinfo.get("picture", "")
         
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         if not user:
             user = User(name=name, email=email, avatar=avatar, is_verified=True)
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         
         jwt_token = create_access_token({"user_id": str(user.id), "email": user.email, "name": user.name})
         
@@ -109,11 +113,11 @@ async def google_login(payload: GoogleAuthRequest, db: Session = Depends(get_db)
 async def verify_email_endpoint(
     payload: VerifyCodeRequest, 
     background_tasks: BackgroundTasks, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         # Call the verify_email function and return the response
-        response = verify_email(payload, db)
+        response = await verify_email(payload, db)
         return response
     except HTTPException as e:
         # Catch any HTTPException and return the error details
@@ -124,19 +128,19 @@ async def verify_email_endpoint(
 
 
 @router.post("/forgot-password", status_code=status.HTTP_200_OK)
-async def forgot_password_endpoint(request: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def forgot_password_endpoint(request: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """
     Initiate the password reset process by sending a reset email.
     """
-    result = forgot_password(request, background_tasks, db)
+    result = await forgot_password(request, background_tasks, db)
     return {"success": True, "message": "Password reset email sent", "data": result}
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
-async def reset_password_endpoint(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password_endpoint(request: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Reset the user's password with the given information.
     """
-    result = reset_password(request, db)
+    result = await reset_password(request, db)
     return {"success": True, "message": "Password reset successful", "data": result}
 
 @router.get("/me", response_model=UserResponse)
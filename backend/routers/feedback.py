@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from uuid import UUID
-from ..config.db_config import get_db
+from typing import Optional
+from ..config.db_config import get_async_db, settings
 from ..models.user_models import User
 from ..models.feedback_models import UserFeedback 
 from ..schemas.feedback_schemas import UserFeedbackCreate, UserFeedbackSchema  
 from ..services.auth_service import get_current_user, get_current_admin 
+from ..services.export_service import EXPORT_FORMATS, check_format, export_filename, stream_export
+from ..services.pagination_service import keyset_page, split_page, set_next_cursor
 import logging
 
 # Configure logging
@@ -19,7 +24,7 @@ router = APIRouter(prefix="/feedback", tags=["Feedback"])
 @router.post("/", response_model=UserFeedbackSchema, status_code=status.HTTP_201_CREATED)
 async def submit_feedback(
     feedback: UserFeedbackCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -39,8 +44,8 @@ async def submit_feedback(
         )
 
         db.add(new_feedback)
-        db.commit()
-        db.refresh(new_feedback)
+        await db.commit()
+        await db.refresh(new_feedback)
 
         return UserFeedbackSchema.from_orm(new_feedback)
     
@@ -52,11 +57,20 @@ async def submit_feedback(
 
 @router.get("/all", status_code=status.HTTP_200_OK)
 async def get_all_feedbacks(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    user_id: Optional[UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)  
 ):
     """
-    Retrieve all user feedback (Accessible to admins or authenticated users).
+    Retrieve user feedback, newest first, one page at a time (Accessible to admins or authenticated users).
+
+    The next page's cursor is returned in the X-Next-Cursor and Link headers.
     """
     if not current_user or not hasattr(current_user, "id"):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not authenticated")
@@ -64,9 +78,8 @@ async def get_all_feedbacks(
     logger.info("Fetching all feedbacks...")
 
     try:
-        # Fetch distinct feedbacks by grouping on UserFeedback.id
-        feedbacks = (
-            db.query(
+        stmt = (
+            select(
                 UserFeedback.id,
                 UserFeedback.feedback_text,
                 UserFeedback.rating,
@@ -74,10 +87,18 @@ async def get_all_feedbacks(
                 User.name.label("user_name"), 
             )
             .join(User, UserFeedback.user_id == User.id)  
-            .filter(UserFeedback.id.isnot(None))
-            .order_by(UserFeedback.timestamp.desc())  
-            .all()
         )
+        if user_id:
+            stmt = stmt.where(UserFeedback.user_id == user_id)
+        if date_from:
+            stmt = stmt.where(UserFeedback.timestamp >= date_from)
+        if date_to:
+            stmt = stmt.where(UserFeedback.timestamp < date_to)
+        stmt = keyset_page(stmt, UserFeedback.timestamp, UserFeedback.id, cursor, limit)
+
+        result = await db.execute(stmt)
+        feedbacks, next_cursor = split_page(result.all(), limit, "timestamp")
+        set_next_cursor(request, response, next_cursor)
 
 
 
@@ -98,15 +119,57 @@ async def get_all_feedbacks(
 
         return feedback_list
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving feedbacks: {str(e)}", exc_info=True)  
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve feedbacks")
 
 
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_feedbacks(
+    format: str = Query(default="csv", description="csv, ndjson or parquet"),
+    user_id: Optional[UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Download all user feedback as CSV, NDJSON or Parquet (Admins only).
+
+    Rows are streamed from a server-side cursor, so exports of any size use constant memory.
+    """
+    check_format(format)
+    stmt = (
+        select(
+            UserFeedback.id,
+            UserFeedback.user_id,
+            User.name.label("user_name"),
+            UserFeedback.rating,
+            UserFeedback.feedback_text,
+            UserFeedback.timestamp,
+        )
+        .join(User, UserFeedback.user_id == User.id)
+    )
+    if user_id:
+        stmt = stmt.where(UserFeedback.user_id == user_id)
+    if date_from:
+        stmt = stmt.where(UserFeedback.timestamp >= date_from)
+    if date_to:
+        stmt = stmt.where(UserFeedback.timestamp < date_to)
+    stmt = stmt.order_by(UserFeedback.timestamp, UserFeedback.id)
+
+    return StreamingResponse(
+        stream_export(stmt, format, settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_FORMATS[format][0],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("user_feedback", format)}"'},
+    )
+
+
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_user_feedbacks(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)  # Only authenticated users can retrieve their own feedback
 ):
     """
@@ -119,12 +182,12 @@ async def get_user_feedbacks(
 
     try:
         # Query feedback filtered by the current user's ID
-        feedbacks = (
-            db.query(UserFeedback)
-            .filter(UserFeedback.user_id == current_user.id)  
+        result = await db.execute(
+            select(UserFeedback)
+            .where(UserFeedback.user_id == current_user.id)  
             .order_by(UserFeedback.timestamp.desc())
-            .all()
         )
+        feedbacks = result.scalars().all()
 
         if not feedbacks:
             return []
@@ -150,7 +213,7 @@ async def get_user_feedbacks(
 @router.delete("/{feedback_id}", status_code=status.HTTP_200_OK)
 async def delete_feedback(
     feedback_id: UUID,  # Use UUID type for the ID
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)  
 ):
     """
@@ -159,7 +222,7 @@ async def delete_feedback(
     logger.info(f"User {current_user.id} deleting feedback: {feedback_id}")
 
     try:
-        feedback = db.query(UserFeedback).filter(UserFeedback.id == feedback_id).first()
+        feedback = await db.get(UserFeedback, feedback_id)
 
         if not feedback:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feedback not found")
@@ -168,8 +231,8 @@ async def delete_feedback(
         if feedback.user_id != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only delete your own feedback")
 
-        db.delete(feedback)
-        db.commit()
+        await db.delete(feedback)
+        await db.commit()
         
         return {
             "success": True,
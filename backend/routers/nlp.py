@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+import asyncio
 from ..schemas.auth_schemas import User
-from ..schemas.nlp_schemas import NLPRequest, NLPResponse
-from ..services.nlp_service import NLPModel
-from ..config.db_config import get_db
-from ..services.auth_service import get_current_user
+from ..schemas.nlp_schemas import NLPRequest, NLPResponse, NLPArticle, NLPArticleResponse
+from ..services.model_registry import model_registry
+from ..services import nlp_service  # Registers the "nlp" model
+from ..config.db_config import get_async_db, settings
+from ..services.auth_service import get_current_admin, get_current_user
 
 router = APIRouter(
     prefix="/nlp",
@@ -13,17 +15,16 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Initialize the NLP model instance
-nlp_model = NLPModel()
-
 @router.post("/predict", response_model=NLPResponse)
 async def predict_text(
     request: NLPRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user)
 ):
     try:
-        response_text = nlp_model.get_response(request.text) 
+        # Model loading and inference are CPU-bound; keep them off the event loop
+        nlp_model = await asyncio.to_thread(model_registry.get, "nlp")
+        response_text = await asyncio.to_thread(nlp_model.get_response, request.text, request.max_length)
 
         return NLPResponse(response=response_text)  
 
@@ -33,3 +34,49 @@ async def predict_text(
             detail=f"Internal server error: {str(e)}"
         )
 
+
+@router.get("/cache/stats", status_code=status.HTTP_200_OK)
+async def get_nlp_cache_stats(admin: dict = Depends(get_current_admin)):
+    """
+    Report hit/miss counters and sizes of the NLP query-embedding, answer and
+    semantic caches, with the latest sampled semantic hits whose cached answer
+    differed from a fresh one. Restricted to admin users, since those hold
+    other users' questions.
+    """
+    return {
+        "enabled": settings.NLP_CACHE_ENABLED,
+        "semantic_enabled": settings.NLP_SEMANTIC_CACHE_ENABLED,
+        **{name: cache.stats() for name, cache in nlp_service.NLP_CACHES.items()},
+        "coalesced": nlp_service.answer_flights.coalesced,
+        "recent_semantic_disagreements": list(nlp_service.recent_semantic_disagreements),
+    }
+
+@router.put("/articles/{topic}", response_model=NLPArticleResponse)
+async def put_article(
+    topic: str,
+    article: NLPArticle,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Add or replace a knowledge-base article without rebuilding the passage index.
+    Applies to this worker process until restart. Restricted to admin users.
+    """
+    nlp_model = await asyncio.to_thread(model_registry.get, "nlp")
+    passages = await asyncio.to_thread(nlp_model.add_article, topic, article.text)
+    return NLPArticleResponse(topic=topic, passages=passages)
+
+@router.delete("/articles/{topic}", status_code=status.HTTP_200_OK)
+async def delete_article(
+    topic: str,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Remove a knowledge-base article from this worker process. Restricted to admin users.
+    """
+    nlp_model = await asyncio.to_thread(model_registry.get, "nlp")
+    if not await asyncio.to_thread(nlp_model.remove_article, topic):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Article '{topic}' not found."
+        )
+    return {"message": f"Article '{topic}' removed."}
@@ -1,27 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
-from ..config.db_config import get_db
+from ..config.db_config import get_async_db, settings
+from ..services.pagination_service import keyset_page, split_page, set_next_cursor
 from ..models.user_models import User
 from ..schemas.auth_schemas import UserResponse
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 @router.get("/", response_model=List[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
-    """Retrieve all users."""
-    users = db.query(User).all()
+async def get_all_users(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Retrieve users, newest first, one page at a time (next cursor in the X-Next-Cursor header)."""
+    stmt = select(User)
+    if date_from:
+        stmt = stmt.where(User.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(User.created_at < date_to)
+    stmt = keyset_page(stmt, User.created_at, User.id, cursor, limit)
+
+    result = await db.execute(stmt)
+    users, next_cursor = split_page(result.scalars().all(), limit, "created_at")
+    set_next_cursor(request, response, next_cursor)
     return users
 
 @router.delete("/{user_id}", response_model=dict)
-def delete_user(user_id: UUID, db: Session = Depends(get_db)):
+async def delete_user(user_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Delete a user by their ID."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(user)
-    db.commit()
-    return {"message": "User deleted successfully"}
+    await db.delete(user)
+    await db.commit()
+    return {"message": "User deleted successfully"}
\ No newline at end of file
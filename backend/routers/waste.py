@@ -1,11 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from ..config.db_config import get_db
-from ..services.auth_service import get_current_admin
-from ..models.waste_models import WasteType, WasteRecord, RecyclingInstructions, DecompositionInfo
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+from ..config.db_config import get_async_db, settings
+from ..services.auth_service import get_current_admin, get_current_user
+from ..services.catalog_service import waste_catalog
+from ..services.stats_service import stats_query
+from ..services.export_service import EXPORT_FORMATS, check_format, export_filename, stream_export
+from ..services.pagination_service import keyset_page, split_page, set_next_cursor
+from ..models.waste_models import WasteType, WasteAlias, WasteRecord, RecyclingInstructions, DecompositionInfo
+from ..utils.lookup_keys import normalize_waste_name
 from ..schemas.waste_schemas import (
     WasteType as WasteTypeSchema,
     WasteTypeCreate,
+    WasteAlias as WasteAliasSchema,
+    WasteAliasCreate,
+    WasteStatsResponse,
+    WasteCategoryStats,
+    WasteDailyCategoryStats,
     WasteRecordCreate,
     WasteRecord as WasteRecordSchema,
     RecyclingInstructionsCreate,
@@ -15,13 +31,28 @@ import json
 
 router = APIRouter(prefix="/waste", tags=["Waste Management"])
 
+
+async def find_waste_type(db: AsyncSession, name: str, *options) -> Optional[WasteType]:
+    """Resolve a waste type by name or alias through the unique lookup-key indexes."""
+    key = normalize_waste_name(name)
+    stmt = select(WasteType).options(*options)
+    result = await db.execute(stmt.where(WasteType.lookup_key == key))
+    waste = result.scalars().first()
+    if waste is None:
+        result = await db.execute(
+            stmt.join(WasteAlias, WasteAlias.waste_type_id == WasteType.id).where(WasteAlias.lookup_key == key)
+        )
+        waste = result.scalars().first()
+    return waste
+
 # ------------------ Waste Types ------------------
 @router.get("/", response_model=list[WasteTypeSchema], status_code=status.HTTP_200_OK)
-async def get_waste_types(db: Session = Depends(get_db)):
+async def get_waste_types(db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve all waste types.
     """
-    waste_types = db.query(WasteType).all()
+    result = await db.execute(select(WasteType))
+    waste_types = result.scalars().all()
     if not waste_types:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,13 +67,14 @@ async def get_waste_types(db: Session = Depends(get_db)):
 @router.post("/", response_model=WasteTypeSchema, status_code=status.HTTP_201_CREATED)
 async def create_waste_type(
     waste_type: WasteTypeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin: dict = Depends(get_current_admin)
 ):
     """
     Create a new waste type. Restricted to admin users.
     """
-    existing_waste = db.query(WasteType).filter(WasteType.name.ilike(waste_type.name)).first()
+    result = await db.execute(select(WasteType).where(WasteType.lookup_key == normalize_waste_name(waste_type.name)))
+    existing_waste = result.scalars().first()
     if existing_waste:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -50,50 +82,252 @@ async def create_waste_type(
         )
     new_waste_type = WasteType(name=waste_type.name, category=waste_type.category)
     db.add(new_waste_type)
-    db.commit()
-    db.refresh(new_waste_type)
-    return WasteTypeSchema(**{**new_waste_type.__dict__, "id": str(new_waste_type.id)})
+    await db.commit()
+    await db.refresh(new_waste_type)
+    response = WasteTypeSchema(**{**new_waste_type.__dict__, "id": str(new_waste_type.id)})
+    await db.run_sync(waste_catalog.rebuild)
+    return response
+
+@router.get("/search", response_model=list[WasteTypeSchema], status_code=status.HTTP_200_OK)
+async def search_waste_types(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(default=10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Find waste types whose name or alias contains the query, shortest match first.
+
+    On PostgreSQL the pg_trgm indexes created by the lookup-key migration serve these substring matches.
+    """
+    pattern = f"%{normalize_waste_name(q)}%"
+    alias_matches = select(WasteAlias.waste_type_id).where(WasteAlias.lookup_key.like(pattern))
+    result = await db.execute(
+        select(WasteType)
+        .where(WasteType.lookup_key.like(pattern) | WasteType.id.in_(alias_matches))
+        .order_by(func.length(WasteType.lookup_key), WasteType.lookup_key)
+        .limit(limit)
+    )
+    return [WasteTypeSchema(**{**waste.__dict__, "id": str(waste.id)}) for waste in result.scalars().all()]
+
+# ------------------ Statistics ------------------
+@router.get("/stats", response_model=WasteStatsResponse, status_code=status.HTTP_200_OK)
+async def get_waste_stats(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    daily: bool = Query(default=False, description="Also break the totals down per day"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Record counts and total estimated weight per category between two days (inclusive).
+
+    Served from the daily rollup table, which is kept up to date as records are written.
+    """
+    result = await db.execute(stats_query(date_from, date_to))
+    data = [
+        WasteCategoryStats(category=row.waste_category, count=row.count, total_weight=row.total_weight)
+        for row in result.all()
+    ]
+    daily_data = None
+    if daily:
+        result = await db.execute(stats_query(date_from, date_to, daily=True))
+        daily_data = [
+            WasteDailyCategoryStats(day=row.day, category=row.waste_category, count=row.count, total_weight=row.total_weight)
+            for row in result.all()
+        ]
+    return WasteStatsResponse(data=data, daily=daily_data)
+
+# ------------------ Waste Aliases ------------------
+@router.get("/{waste_type_name}/aliases", response_model=list[WasteAliasSchema], status_code=status.HTTP_200_OK)
+async def get_waste_aliases(waste_type_name: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    List the YOLO labels and synonyms that resolve to a waste type.
+    """
+    waste = await find_waste_type(db, waste_type_name, selectinload(WasteType.aliases))
+    if not waste:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Waste type '{waste_type_name}' not found."
+        )
+    return [
+        WasteAliasSchema(id=str(alias.id), alias=alias.alias, source=alias.source, waste_type=waste.name)
+        for alias in waste.aliases
+    ]
+
+@router.post("/{waste_type_name}/aliases", response_model=WasteAliasSchema, status_code=status.HTTP_201_CREATED)
+async def create_waste_alias(
+    waste_type_name: str,
+    alias: WasteAliasCreate,
+    db: AsyncSession = Depends(get_async_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Map a YOLO class label or synonym to a waste type. Restricted to admin users.
+    """
+    waste = await find_waste_type(db, waste_type_name)
+    if not waste:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Waste type '{waste_type_name}' not found."
+        )
+    if await find_waste_type(db, alias.alias):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'{alias.alias}' already names a waste type or alias."
+        )
+    new_alias = WasteAlias(waste_type_id=waste.id, alias=alias.alias, source=alias.source)
+    db.add(new_alias)
+    await db.commit()
+    await db.run_sync(waste_catalog.rebuild)
+    return WasteAliasSchema(id=str(new_alias.id), alias=new_alias.alias, source=new_alias.source, waste_type=waste.name)
+
+@router.delete("/aliases/{alias}", status_code=status.HTTP_200_OK)
+async def delete_waste_alias(
+    alias: str,
+    db: AsyncSession = Depends(get_async_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Remove an alias. Restricted to admin users.
+    """
+    result = await db.execute(select(WasteAlias).where(WasteAlias.lookup_key == normalize_waste_name(alias)))
+    existing_alias = result.scalars().first()
+    if not existing_alias:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Alias '{alias}' not found."
+        )
+    await db.delete(existing_alias)
+    await db.commit()
+    await db.run_sync(waste_catalog.rebuild)
+    return {"message": f"Alias '{alias}' deleted successfully."}
 
 # ------------------ Waste Records ------------------
 @router.post("/records/", response_model=WasteRecordSchema, status_code=status.HTTP_201_CREATED)
 async def create_waste_record(
     waste_record: WasteRecordCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new waste classification record.
     """
     new_record = WasteRecord(**waste_record.dict())
     db.add(new_record)
-    db.commit()
-    db.refresh(new_record)
+    await db.commit()
+    await db.refresh(new_record)
     return new_record
 
 @router.get("/records/", response_model=list[WasteRecordSchema], status_code=status.HTTP_200_OK)
-async def get_waste_records(db: Session = Depends(get_db)):
+async def get_waste_records(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    category: Optional[str] = None,
+    user_id: Optional[UUID] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Retrieve all waste classification records.
+    Retrieve waste classification records, newest first, one page at a time.
+
+    The next page's cursor is returned in the X-Next-Cursor and Link headers.
     """
-    records = db.query(WasteRecord).all()
-    if not records:
+    stmt = select(WasteRecord)
+    if user_id:
+        stmt = stmt.where(WasteRecord.user_id == user_id)
+    if category:
+        stmt = stmt.where(WasteRecord.waste_category == category)
+    if date_from:
+        stmt = stmt.where(WasteRecord.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(WasteRecord.created_at < date_to)
+    stmt = keyset_page(stmt, WasteRecord.created_at, WasteRecord.id, cursor, limit)
+
+    result = await db.execute(stmt)
+    records, next_cursor = split_page(result.scalars().all(), limit, "created_at")
+    set_next_cursor(request, response, next_cursor)
+    if not records and not cursor:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No waste records found."
         )
     return records
 
+@router.get("/history", response_model=list[WasteRecordSchema], status_code=status.HTTP_200_OK)
+async def get_waste_history(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    category: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Retrieve the authenticated user's classification history, newest first, one page at a time.
+
+    Results are written in the background, so a classification shows up here
+    within HISTORY_FLUSH_MS. The next page's cursor is returned in the
+    X-Next-Cursor and Link headers.
+    """
+    stmt = select(WasteRecord).where(WasteRecord.user_id == current_user.id)
+    if category:
+        stmt = stmt.where(WasteRecord.waste_category == category)
+    if date_from:
+        stmt = stmt.where(WasteRecord.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(WasteRecord.created_at < date_to)
+    stmt = keyset_page(stmt, WasteRecord.created_at, WasteRecord.id, cursor, limit)
+
+    result = await db.execute(stmt)
+    records, next_cursor = split_page(result.scalars().all(), limit, "created_at")
+    set_next_cursor(request, response, next_cursor)
+    return [WasteRecordSchema(**{**record.__dict__, "id": str(record.id)}) for record in records]
+
+@router.get("/records/export", status_code=status.HTTP_200_OK)
+async def export_waste_records(
+    format: str = Query(default="csv", description="csv, ndjson or parquet"),
+    category: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Download every waste record as CSV, NDJSON or Parquet. Restricted to admin users.
+
+    Rows are streamed from a server-side cursor, so exports of any size use constant memory.
+    """
+    check_format(format)
+    stmt = select(*WasteRecord.__table__.columns)
+    if category:
+        stmt = stmt.where(WasteRecord.waste_category == category)
+    if date_from:
+        stmt = stmt.where(WasteRecord.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(WasteRecord.created_at < date_to)
+    stmt = stmt.order_by(WasteRecord.created_at, WasteRecord.id)
+
+    return StreamingResponse(
+        stream_export(stmt, format, settings.EXPORT_BATCH_SIZE),
+        media_type=EXPORT_FORMATS[format][0],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("waste_records", format)}"'},
+    )
+
 # ------------------ Recycling Instructions ------------------
 @router.post("/{waste_type_name}/recycling", status_code=status.HTTP_201_CREATED)
 async def create_recycling_instructions(
     waste_type_name: str,
     instructions: RecyclingInstructionsCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin: dict = Depends(get_current_admin)
 ):
     """
     Create recycling instructions for a specific waste type.
     """
-    waste = db.query(WasteType).filter(WasteType.name.ilike(waste_type_name)).first()
+    waste = await find_waste_type(db, waste_type_name, selectinload(WasteType.recycling_instructions))
     if not waste:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,22 +343,18 @@ async def create_recycling_instructions(
         instructions=[instr.dict() for instr in instructions.instructions]
     )
     db.add(recycling_instruction)
-    db.commit()
-    db.refresh(recycling_instruction)
+    await db.commit()
+    await db.refresh(recycling_instruction)
+    await db.run_sync(waste_catalog.rebuild)
     return {"message": f"Recycling instructions for '{waste_type_name}' created successfully."}
 
 
 @router.get("/{waste_type_name}/recycling", status_code=status.HTTP_200_OK)
-async def get_recycling_instructions(waste_type_name: str, db: Session = Depends(get_db)):
+async def get_recycling_instructions(waste_type_name: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get recycling instructions for a specific waste type.
     """
-    waste = (
-        db.query(WasteType)
-        .options(joinedload(WasteType.recycling_instructions))  # Eager load instructions
-        .filter(WasteType.name.ilike(waste_type_name))
-        .first()
-    )
+    waste = await find_waste_type(db, waste_type_name, joinedload(WasteType.recycling_instructions))  # Eager load instructions
     if not waste:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -138,13 +368,13 @@ async def get_recycling_instructions(waste_type_name: str, db: Session = Depends
 async def create_decomposition_info(
     waste_type_name: str,
     decomposition_data: DecompositionInfoCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     admin: dict = Depends(get_current_admin)
 ):
     """
     Create decomposition information for a specific waste type.
     """
-    waste = db.query(WasteType).filter(WasteType.name.ilike(waste_type_name)).first()
+    waste = await find_waste_type(db, waste_type_name)
     if not waste:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -161,25 +391,27 @@ async def create_decomposition_info(
     )
 
     db.add(decomposition_info)
-    db.commit()
-    db.refresh(decomposition_info)
+    await db.commit()
+    await db.refresh(decomposition_info)
+    await db.run_sync(waste_catalog.rebuild)
 
     return {"message": f"Decomposition information for '{waste_type_name}' created successfully."}
 
 
 @router.get("/{waste_type_name}/decomposition", status_code=status.HTTP_200_OK)
-async def get_decomposition_info(waste_type_name: str, db: Session = Depends(get_db)):
+async def get_decomposition_info(waste_type_name: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get decomposition information details for a specific waste type.
     """
-    waste = db.query(WasteType).filter(WasteType.name.ilike(waste_type_name)).first()
+    waste = await find_waste_type(db, waste_type_name)
     if not waste:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Decomposition information for '{waste_type_name}' not found."
         )
 
-    decomposition_info = db.query(DecompositionInfo).filter(DecompositionInfo.waste_type_id == waste.id).first()
+    result = await db.execute(select(DecompositionInfo).where(DecompositionInfo.waste_type_id == waste.id))
+    decomposition_info = result.scalars().first()
     if not decomposition_info:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, BackgroundTasks, Request, WebSocket, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import List, Optional
+from uuid import UUID
 from ..services import classification_service
-from ..config.db_config import get_db
+from ..services.bulk_classification_service import spool_uploads, stream_bulk_classification
+from ..services.stream_service import StreamSession, run_stream, iter_mjpeg_frames, iter_file_chunks, iter_websocket_frames
+from ..services.image_preprocessing import SUPPORTED_IMAGE_FORMATS
+from ..services.auth_service import get_current_admin, get_optional_user_id
+from ..schemas.waste_schemas import ModelSwapRequest
+from ..services.inference_executor import inference_executor, ExecutorSaturatedError
+from ..services.timing_service import stage, record_since_start
+from ..config.db_config import get_db, settings
 import time
 import logging
 import imghdr
+import json
+import os
+import asyncio
+import tempfile
 
 router = APIRouter(prefix="/classify", tags=["Classification"])
 
 @router.post("/", status_code=status.HTTP_200_OK)
-async def classify_waste_endpoint(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def classify_waste_endpoint(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user_id: Optional[UUID] = Depends(get_optional_user_id)
+):
     start_time = time.time()
     try:
         # Validate file content type
@@ -20,20 +38,30 @@ async def classify_waste_endpoint(file: UploadFile = File(...), db: Session = De
                 detail=f"Uploaded file is not an image. Content type: {file.content_type}"
             )
 
-        # Read file bytes
+        # Read file bytes (the multipart body was parsed before the endpoint ran)
         image_bytes = await file.read()
+        record_since_start("upload")
 
         # Validate image format using imghdr
-        image_format = imghdr.what(None, image_bytes)
-        if image_format not in ["jpeg", "png", "gif", "bmp", "tiff"]:
+        with stage("sniff"):
+            image_format = imghdr.what(None, image_bytes)
+        if image_format not in SUPPORTED_IMAGE_FORMATS:
             logging.error(f"Unsupported image format: {image_format}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Unsupported image format: {image_format}"
             )
 
-        # Classify the waste
-        waste_data = classification_service.classify_waste(image_bytes, db)
+        # Classify the waste on the inference pool so the event loop stays free
+        try:
+            result = await inference_executor.run(classification_service.classify_waste, image_bytes, db, user_id)
+        except ExecutorSaturatedError as e:
+            logging.warning(f"Rejecting classification of '{file.filename}': {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Classification service is busy. Please retry shortly.",
+                headers={"Retry-After": str(e.retry_after)}
+            )
 
         # Measure execution time
         execution_time = time.time() - start_time
@@ -46,7 +74,8 @@ async def classify_waste_endpoint(file: UploadFile = File(...), db: Session = De
             "success": True,
             "message": "Waste classification successful",
             "execution_time": execution_time,
-            "classification": waste_data
+            "model_version": result["model_version"],
+            "classification": result["detected_items"]
         }
 
     except HTTPException as e:
@@ -62,3 +91,153 @@ async def classify_waste_endpoint(file: UploadFile = File(...), db: Session = De
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred while processing the image."
         )
+
+
+@router.post("/bulk", status_code=status.HTTP_200_OK)
+async def classify_waste_bulk_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Classify many images in one request.
+
+    Accepts any number of image files and/or zip/tar archives of images and
+    streams back one NDJSON line per image as soon as it is classified,
+    followed by a summary line.
+    """
+    # Spool the uploads first: the form files may be closed before the response body is produced
+    uploads = await spool_uploads(files, settings.BULK_MAX_UPLOAD_BYTES)
+    return StreamingResponse(stream_bulk_classification(uploads), media_type="application/x-ndjson")
+
+
+# ------------------ Video / Camera Streams ------------------
+@router.websocket("/stream")
+async def classify_waste_stream(websocket: WebSocket, sample_fps: float = Query(default=None, gt=0)):
+    """
+    Classify a live camera feed sent as binary JPEG/PNG frames over a WebSocket.
+
+    Frames are sampled at `sample_fps`, dropped while the detector is busy, and
+    tracked across frames. Each physical item is reported once as an "item"
+    event, followed by a running "summary" of counts and weights.
+    """
+    await websocket.accept()
+    session = StreamSession(sample_fps=sample_fps or settings.STREAM_SAMPLE_FPS)
+    try:
+        async for event in run_stream(iter_websocket_frames(websocket), session, live=True):
+            await websocket.send_text(json.dumps(event, default=str))
+        await websocket.close()
+    except Exception as e:
+        logging.info(f"Classification stream closed: {e}")
+
+
+@router.post("/stream/mjpeg", status_code=status.HTTP_200_OK)
+async def classify_waste_mjpeg(
+    request: Request,
+    sample_fps: float = Query(default=None, gt=0),
+    source_fps: float = Query(default=30, gt=0)
+):
+    """
+    Classify a recorded MJPEG upload and stream tracking events back as NDJSON.
+
+    Every n-th frame (source_fps / sample_fps) is run through the detector and
+    objects are tracked across frames, so each item is reported once. Uploads
+    over STREAM_MAX_UPLOAD_BYTES are rejected with a 413. Live camera feeds
+    should use the WebSocket endpoint instead.
+    """
+    max_bytes = settings.STREAM_MAX_UPLOAD_BYTES
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"MJPEG upload is too large. Maximum is {max_bytes} bytes."
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+
+    # Spool the body first: the response cannot be streamed while the request body is still being read
+    upload = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:  # Chunked bodies carry no Content-Length
+                raise too_large
+            await asyncio.to_thread(upload.write, chunk)
+    except BaseException:
+        upload.close()
+        raise
+    upload.seek(0)
+
+    async def events():
+        session = StreamSession(sample_fps=sample_fps or settings.STREAM_SAMPLE_FPS, source_fps=source_fps)
+        try:
+            frames = iter_mjpeg_frames(iter_file_chunks(upload), settings.STREAM_MAX_FRAME_BYTES)
+            async for event in run_stream(frames, session, live=False):
+                yield json.dumps(event, default=str) + "\n"
+        finally:
+            upload.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.get("/cache/stats", status_code=status.HTTP_200_OK)
+async def get_classification_cache_stats():
+    """
+    Report hit/miss counters and size of the classification result cache.
+    """
+    return {
+        "enabled": settings.RESULT_CACHE_ENABLED,
+        "hash_mode": settings.RESULT_CACHE_HASH_MODE,
+        **classification_service.result_cache.stats()
+    }
+
+
+# ------------------ Detector Versions ------------------
+@router.get("/models", status_code=status.HTTP_200_OK)
+async def get_detector_versions():
+    """
+    Report the active and shadow detector versions and recent swaps.
+    """
+    return classification_service.detector_manager.status()
+
+
+def _load_detector_version(model_path: str, shadow: bool):
+    try:
+        classification_service.detector_manager.activate(model_path, shadow=shadow)
+    except Exception as e:
+        logging.error(f"Hot-swap to '{model_path}' failed: {e}")
+
+
+@router.post("/models", status_code=status.HTTP_202_ACCEPTED)
+async def swap_detector_version(
+    request: ModelSwapRequest,
+    background_tasks: BackgroundTasks,
+    admin: dict = Depends(get_current_admin)
+):
+    """
+    Load new detector weights in the background and swap them in once warmed up.
+    Restricted to admin users.
+    """
+    weights_dir = os.path.realpath(os.path.dirname(settings.MODEL_PATH))
+    model_path = os.path.realpath(request.model_path)
+    if os.path.commonpath([weights_dir, model_path]) != weights_dir or not os.path.isfile(model_path):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Model weights must be an existing file inside '{weights_dir}'."
+        )
+    if classification_service.detector_manager.loading:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another detector version is already loading."
+        )
+
+    background_tasks.add_task(_load_detector_version, model_path, request.shadow)
+    return {
+        "message": f"Loading '{os.path.basename(model_path)}' as {'shadow' if request.shadow else 'active'} detector.",
+        "version": classification_service.get_model_version(model_path)
+    }
+
+
+@router.delete("/models/shadow", status_code=status.HTTP_200_OK)
+async def clear_shadow_detector(admin: dict = Depends(get_current_admin)):
+    """
+    Stop shadowing traffic to a candidate detector. Restricted to admin users.
+    """
+    classification_service.detector_manager.clear_shadow()
+    return {"message": "Shadow detector cleared."}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, conint
+from pydantic import BaseModel, conint, constr
 from typing import Optional
 
 class NLPRequest(BaseModel):
@@ -33,6 +33,19 @@ class NLPResponse(BaseModel):
             }
         }
 
+class NLPArticle(BaseModel):
+    """
+    Schema for adding or replacing a knowledge-base article.
+    """
+    text: constr(min_length=1)  # type: ignore
+
+class NLPArticleResponse(BaseModel):
+    """
+    Schema for the result of a knowledge-base change.
+    """
+    topic: str
+    passages: int
+
 class NLPErrorResponse(BaseModel):
     """
     Schema for error responses in NLP operations.
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from uuid import UUID
+from datetime import date, datetime
 from sqlalchemy.orm import relationship
 
 # ----------------- WasteType Schema ---------------------
@@ -29,12 +30,37 @@ class WasteType(WasteTypeBase):
         from_attributes = True
         json_encoders = {UUID: str}
 
+# ----------------- WasteAlias Schema ---------------------
+class WasteAliasCreate(BaseModel):
+    """Schema for mapping a YOLO class label or synonym to a waste type"""
+    alias: str = Field(..., min_length=2, max_length=255)
+    source: Literal["yolo", "synonym"] = "synonym"
+
+class WasteAlias(WasteAliasCreate):
+    """Schema for retrieving an alias"""
+    id: str
+    waste_type: str
+
 class WasteCategoryStats(BaseModel):
     category: str
     count: int
+    total_weight: float = 0.0
+
+class WasteDailyCategoryStats(WasteCategoryStats):
+    day: date
 
 class WasteStatsResponse(BaseModel):
     data: List[WasteCategoryStats]
+    daily: Optional[List[WasteDailyCategoryStats]] = None
+
+# ----------------- Detector Model Schema ---------------------
+class ModelSwapRequest(BaseModel):
+    """Schema for loading a new detector version"""
+    model_path: str = Field(..., min_length=1, description="Path to the new weights, inside the weights directory")
+    shadow: bool = Field(default=False, description="Run as a shadow model instead of replacing the active one")
+
+    class Config:
+        protected_namespaces = ()
 
 # ----------------- RecyclingInstructions Schema ---------------------
 class Instruction(BaseModel):
@@ -127,6 +153,11 @@ class WasteRecordCreate(WasteRecordBase):
 class WasteRecord(WasteRecordBase):
     """Schema for retrieving waste records"""
     id: str
+    created_at: Optional[datetime] = None
+    confidence: Optional[float] = None
+    item_count: Optional[int] = None
+    model_version: Optional[str] = None
 
     class Config:
         model_config = {"from_attributes": True}
+        protected_namespaces = ()
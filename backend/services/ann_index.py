@@ -0,0 +1,264 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from .embedding_index import EmbeddingIndex, normalize_rows, top_k
+
+logging.basicConfig(level=logging.INFO)
+
+
+def default_n_lists(count: int) -> int:
+    """About sqrt(n) lists keeps both the centroid scan and the list scans small."""
+    return max(1, int(round(math.sqrt(count))))
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for every row, computed in chunks to bound memory."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignment[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0,
+                    points_per_list: int = 256) -> np.ndarray:
+    """
+    Spherical k-means: unit-length centroids that maximize cosine similarity to their members.
+
+    Trains on a sample of at most `points_per_list` vectors per list, which is
+    plenty to place the centroids and keeps building cheap for large indexes.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    if n_lists == 1:
+        return normalize_rows(np.asarray(vectors, dtype=np.float32).sum(axis=0, keepdims=True))
+
+    sample_size = min(count, n_lists * points_per_list)
+    sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(sample[np.argsort(assignment, kind="stable")], starts[filled], axis=0)
+        # Reseed empty lists with random points instead of leaving dead centroids
+        sums[~filled] = sample[rng.choice(sample_size, int((~filled).sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index for approximate cosine search over unit vectors.
+
+    Vectors are clustered into `n_lists` lists with spherical k-means and stored
+    contiguously by list, so every list is a slice of one matrix (memory-mapped
+    when loaded from disk). A query is scored against the centroids and only the
+    `n_probe` most similar lists are scanned: more probes trade throughput for
+    recall, and probing every list is exact search. With a single list the index
+    is a plain brute-force scan over the source matrix.
+
+    Entries can be added and removed without retraining. Additions go to
+    in-memory overflow arrays of their nearest list and removals are
+    tombstoned; neither is persisted, and the centroids drift from the data as
+    more of it changes, so rebuild after large edits.
+    """
+
+    def __init__(self, centroids: np.ndarray, vectors: np.ndarray, ids: np.ndarray, offsets: np.ndarray,
+                 n_probe: int = 8, manifest: Optional[dict] = None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.n_probe = n_probe
+        self.manifest = manifest or {}
+        n_lists = len(self.centroids)
+        self._extras: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * n_lists  # (ids, vectors) per list
+        self._extra_lists = {}  # id -> list of every added entry
+        self._live = None  # per-row tombstone mask over `vectors`, created by the first removal
+        self._removed_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.ids) - self._removed_count + len(self._extra_lists)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: Optional[Iterable[int]] = None, n_lists: Optional[int] = None,
+              n_probe: int = 8, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Cluster unit-length `vectors` (entry ids default to row numbers) into an index."""
+        count = len(vectors)
+        ids = np.arange(count, dtype=np.int64) if ids is None else np.asarray(list(ids), dtype=np.int64)
+        n_lists = max(1, min(n_lists or default_n_lists(count), count))
+        if count == 0:
+            centroids = np.zeros((1, vectors.shape[1] if np.ndim(vectors) == 2 else 0), dtype=np.float32)
+            return cls(centroids, vectors, ids, np.zeros(2, dtype=np.int64), n_probe)
+
+        start_time = time.time()
+        centroids = train_centroids(vectors, n_lists, iterations, seed)
+        if n_lists == 1:
+            # Nothing to reorder: keep scanning the source matrix without copying it
+            return cls(centroids, vectors, ids, np.array([0, count], dtype=np.int64), n_probe)
+
+        assignment = assign_lists(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+        index = cls(centroids, np.asarray(vectors[order]), ids[order], offsets, n_probe)
+        logging.info(f"IVF index built with {count} entries in {n_lists} lists in {time.time() - start_time:.2f} seconds")
+        return index
+
+    @staticmethod
+    def manifest_path(index_dir: str, name: str) -> str:
+        return os.path.join(index_dir, f"{name}.ivf.json")
+
+    def save(self, index_dir: str, name: str, source_hash: str):
+        """Persist the trained lists next to the source index; overflow entries and tombstones are not saved."""
+        digest = hashlib.sha256(f"{source_hash}:{self.n_lists}".encode()).hexdigest()
+        prefix = f"{name}.ivf-{digest[:16]}"
+        manifest = {
+            "name": name,
+            "source_hash": source_hash,
+            "n_lists": self.n_lists,
+            "count": int(len(self.ids)),
+            "vectors_file": f"{prefix}.npy",
+            "lists_file": f"{prefix}.npz",
+            "built_at": datetime.utcnow().isoformat(),
+        }
+        os.makedirs(index_dir, exist_ok=True)
+        pid = os.getpid()
+        # Write-then-rename, like EmbeddingIndex.build
+        for filename, write in (
+            (manifest["vectors_file"], lambda f: np.save(f, np.asarray(self.vectors))),
+            (manifest["lists_file"], lambda f: np.savez(f, centroids=self.centroids, ids=self.ids, offsets=self.offsets)),
+        ):
+            tmp_path = os.path.join(index_dir, f".{filename}.{pid}.tmp")
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(index_dir, filename))
+        tmp_manifest = self.manifest_path(index_dir, name) + f".{pid}.tmp"
+        with open(tmp_manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, self.manifest_path(index_dir, name))
+
+        for filename in os.listdir(index_dir):
+            if filename.startswith(f"{name}.ivf-") and not filename.startswith(prefix):
+                try:
+                    os.remove(os.path.join(index_dir, filename))
+                except OSError:
+                    pass
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, index_dir: str, name: str, source_hash: str, n_lists: int, n_probe: int = 8) -> Optional["IVFIndex"]:
+        """Memory-map persisted lists; None when they are missing, unreadable or built from other data."""
+        try:
+            with open(cls.manifest_path(index_dir, name), "r") as f:
+                manifest = json.load(f)
+            if manifest.get("source_hash") != source_hash or manifest.get("n_lists") != n_lists:
+                return None
+            vectors = np.load(os.path.join(index_dir, manifest["vectors_file"]), mmap_mode="r")
+            with np.load(os.path.join(index_dir, manifest["lists_file"])) as lists:
+                centroids, ids, offsets = lists["centroids"], lists["ids"], lists["offsets"]
+            if len(vectors) != manifest["count"] or len(ids) != manifest["count"] or offsets[-1] != manifest["count"]:
+                logging.warning(f"IVF index '{name}' does not match its manifest; rebuilding")
+                return None
+            return cls(centroids, vectors, ids, offsets, n_probe, manifest)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Could not load IVF index '{name}': {e}")
+            return None
+
+    @classmethod
+    def load_or_build(cls, index_dir: str, name: str, source: EmbeddingIndex, n_lists: Optional[int] = None,
+                      n_probe: int = 8) -> "IVFIndex":
+        """
+        Index the rows of `source`, reusing persisted lists built from the same content.
+
+        Single-list indexes scan `source.matrix` directly and are never written to disk.
+        """
+        n_lists = max(1, min(n_lists or default_n_lists(len(source)), len(source)))
+        if n_lists == 1:
+            return cls.build(source.matrix, n_lists=1, n_probe=n_probe)
+        source_hash = source.manifest["content_hash"]
+        index = cls.load(index_dir, name, source_hash, n_lists, n_probe)
+        if index is not None:
+            logging.info(f"IVF index '{name}' loaded from disk ({len(index)} entries, {n_lists} lists)")
+            return index
+        index = cls.build(source.matrix, n_lists=n_lists, n_probe=n_probe)
+        index.save(index_dir, name, source_hash)
+        return cls.load(index_dir, name, source_hash, n_lists, n_probe) or index
+
+    def add(self, ids: Iterable[int], vectors: np.ndarray):
+        """Insert entries, replacing any existing entries with the same ids."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if len(ids) == 0:
+            return
+        vectors = normalize_rows(vectors).reshape(len(ids), -1).astype(self.vectors.dtype)
+        assignment = assign_lists(vectors, self.centroids)
+        with self._lock:
+            self._remove(ids)
+            for list_no in np.unique(assignment):
+                members = assignment == list_no
+                extra = self._extras[list_no]
+                # Rebind rather than mutate, so concurrent searches keep a consistent snapshot
+                self._extras[list_no] = ((ids[members], vectors[members]) if extra is None else
+                                         (np.concatenate([extra[0], ids[members]]),
+                                          np.concatenate([extra[1], vectors[members]])))
+            self._extra_lists.update(zip(ids.tolist(), assignment.tolist()))
+
+    def remove(self, ids: Iterable[int]):
+        """Delete entries by id; unknown ids are ignored."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids: np.ndarray):
+        for list_no in {self._extra_lists.pop(entry_id) for entry_id in ids.tolist() if entry_id in self._extra_lists}:
+            extra_ids, extra_vectors = self._extras[list_no]
+            keep = ~np.isin(extra_ids, ids)
+            self._extras[list_no] = (extra_ids[keep], extra_vectors[keep]) if keep.any() else None
+        rows = np.flatnonzero(np.isin(self.ids, ids))
+        if len(rows):
+            if self._live is None:
+                self._live = np.ones(len(self.ids), dtype=bool)
+            self._removed_count += int(self._live[rows].sum())
+            self._live[rows] = False
+
+    def search(self, query: np.ndarray, k: int = 1, n_probe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Return up to `k` (id, cosine similarity) pairs from the `n_probe` nearest lists, best first."""
+        if len(self) == 0:
+            return []
+        query = normalize_rows(query).reshape(-1)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        live_rows = self._live
+        scores, ids = [], []
+        for list_no in top_k(self.centroids @ query, n_probe):
+            start, end = self.offsets[list_no], self.offsets[list_no + 1]
+            if end > start:
+                list_scores, list_ids = self.vectors[start:end] @ query, self.ids[start:end]
+                if live_rows is not None:
+                    live = live_rows[start:end]
+                    list_scores, list_ids = list_scores[live], list_ids[live]
+                scores.append(list_scores)
+                ids.append(list_ids)
+            extra = self._extras[list_no]
+            if extra is not None:
+                scores.append(extra[1] @ query)
+                ids.append(extra[0])
+        if not scores:
+            return []
+        scores, ids = np.concatenate(scores), np.concatenate(ids)
+        return [(int(ids[i]), float(scores[i])) for i in top_k(scores, k)]
@@ -2,11 +2,13 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
+from typing import Optional
+import asyncio
 import os
 from dotenv import load_dotenv
-from ..config.db_config import get_db
 from ..models.user_models import User
 from ..schemas.auth_schemas import (
     UserCreate,
@@ -21,7 +23,7 @@ from ..services.email_service import (
     send_verification_email,
     send_reset_password_email,
 )
-from ..config.db_config import get_db
+from ..config.db_config import get_async_db
 from ..utils.hashing import hash_password, verify_password
 
 load_dotenv()
@@ -33,6 +35,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
 
 # OAuth2 Scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # Create JWT Token
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
@@ -41,13 +44,18 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 # Register User
-def register_user(user_data: UserCreate, background_tasks: BackgroundTasks, db: Session):
-    existing_user = db.query(User).filter(User.email == user_data.email.strip().lower()).first()
+async def register_user(user_data: UserCreate, background_tasks: BackgroundTasks, db: AsyncSession):
+    existing_user = await get_user_by_email(db, user_data.email.strip().lower())
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = hash_password(user_data.password)
+    # bcrypt is deliberately slow; keep it off the event loop
+    hashed_password = await asyncio.to_thread(hash_password, user_data.password)
     new_user = User(
         name=user_data.name, 
         email=user_data.email.strip().lower(),
@@ -58,26 +66,27 @@ def register_user(user_data: UserCreate, background_tasks: BackgroundTasks, db:
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     verification_code = generate_verification_code()
     new_user.verification_token = verification_code
-    db.commit()
+    await db.commit()
 
     send_verification_email(new_user.email, verification_code, background_tasks)
     return new_user
 
 # Verify Email
-def verify_email(payload: VerifyCodeRequest, db: Session):
-    user = db.query(User).filter(User.verification_token == payload.code).first()
+async def verify_email(payload: VerifyCodeRequest, db: AsyncSession):
+    result = await db.execute(select(User).where(User.verification_token == payload.code))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired verification code")
     
     # Mark the user as verified
     user.is_verified = True
     user.verification_token = None
-    db.commit()
+    await db.commit()
     
     # Generate a token for the user after successful verification
     access_token = create_access_token(
@@ -97,10 +106,10 @@ def verify_email(payload: VerifyCodeRequest, db: Session):
     }
 
 # Login User
-def login_user(user: UserLogin, db: Session):
-    user_in_db = db.query(User).filter(User.email == user.email.strip().lower()).first()
+async def login_user(user: UserLogin, db: AsyncSession):
+    user_in_db = await get_user_by_email(db, user.email.strip().lower())
     
-    if not user_in_db or not verify_password(user.password, user_in_db.hashed_password):
+    if not user_in_db or not await asyncio.to_thread(verify_password, user.password, user_in_db.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     if not user_in_db.is_verified:
@@ -123,20 +132,20 @@ def login_user(user: UserLogin, db: Session):
     }
 
 # Forgot Password
-def forgot_password(request: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: Session):
-    user = db.query(User).filter(User.email == request.email.strip().lower()).first()
+async def forgot_password(request: ForgotPasswordRequest, background_tasks: BackgroundTasks, db: AsyncSession):
+    user = await get_user_by_email(db, request.email.strip().lower())
     if not user:
         raise HTTPException(status_code=404, detail="User with this email does not exist.")
     
     reset_token = create_access_token(data={"sub": user.email}, expires_delta=timedelta(minutes=30))
     user.reset_token = reset_token
-    db.commit()
+    await db.commit()
 
     send_reset_password_email(user.email, reset_token, background_tasks)
     return {"message": "Password reset link sent to your email."}
 
 # Reset Password
-def reset_password(request: ResetPasswordRequest, db: Session):
+async def reset_password(request: ResetPasswordRequest, db: AsyncSession):
     try:
         payload = jwt.decode(request.token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -145,17 +154,17 @@ def reset_password(request: ResetPasswordRequest, db: Session):
     except JWTError:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    user.hashed_password = hash_password(request.new_password)
+    user.hashed_password = await asyncio.to_thread(hash_password, request.new_password)
     user.reset_token = None
-    db.commit()
+    await db.commit()
     return {"message": "Password reset successfully."}
 
 # Get Current User
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("user_id") 
@@ -164,7 +173,7 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
             raise HTTPException(status_code=401, detail="Invalid token")
 
         # Fetch the full User object from the database
-        user = db.query(User).filter(User.id == UUID(user_id)).first()
+        user = await db.get(User, UUID(user_id))
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -172,8 +181,18 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+# Get the caller's user id, if any, without a database lookup
+def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[UUID]:
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return UUID(payload["user_id"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
 # Get Current Admin
-def get_current_admin(current_user: TokenData = Depends(get_current_user)):
+async def get_current_admin(current_user: TokenData = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
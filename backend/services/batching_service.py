@@ -0,0 +1,126 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+from .metrics_service import inference_batch_seconds, inference_batch_size
+from .timing_service import current_timings, working_for
+
+logging.basicConfig(level=logging.INFO)
+
+
+class MicroBatcher:
+    """
+    Collect concurrent inference requests into a single batched call.
+
+    Callers submit one item at a time and get back a Future. A background worker
+    waits for the first item, then keeps collecting until either `max_batch_size`
+    items are queued or `max_wait_ms` has passed since the first one arrived, runs
+    `batch_fn` once over the whole batch and hands each caller its own result.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher",
+        metrics_label: Optional[str] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.metrics_label = metrics_label or name
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use."""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+                self._worker.start()
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for the next batch."""
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> Future:
+        """Queue a single item and return a Future for its result."""
+        if self._closed:
+            raise RuntimeError(f"{self.name} has been shut down.")
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((item, future, current_timings()))
+        return future
+
+    def predict(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Submit a single item and block until its result is available."""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self, first: tuple) -> List[tuple]:
+        """Gather items for one batch, starting from the first queued request."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Shutdown sentinel: put it back so the main loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            batch = self._collect(first)
+            # Skip requests whose caller already gave up
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            items = [item for item, _, _ in batch]
+            start_time = time.perf_counter()
+            try:
+                with working_for(timings for _, _, timings in batch):
+                    results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name} returned {len(results)} results for a batch of {len(items)}."
+                    )
+            except Exception as e:
+                logging.error(f"Batched inference failed in {self.name} (batch size {len(items)}): {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                inference_batch_seconds.observe(time.perf_counter() - start_time, self.metrics_label)
+                inference_batch_size.observe(len(items), self.metrics_label)
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting new items and let the worker finish what is already queued."""
+        self._closed = True
+        if self._worker is None:
+            return
+        self._queue.put(None)
+        if wait:
+            self._worker.join()
@@ -0,0 +1,268 @@
+import asyncio
+import imghdr
+import json
+import logging
+import tarfile
+import tempfile
+import time
+import zipfile
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from ..config.db_config import SessionLocal, settings
+from . import classification_service
+from .image_preprocessing import SUPPORTED_IMAGE_FORMATS
+from .inference_executor import inference_executor, ExecutorSaturatedError
+
+logging.basicConfig(level=logging.INFO)
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+# (name, image bytes or None, error message or None)
+BulkItem = Tuple[str, Optional[bytes], Optional[str]]
+
+# Executor slots shared by every bulk job, so bulk uploads cannot starve single-image requests
+_bulk_slots = asyncio.Semaphore(settings.BULK_EXECUTOR_SLOTS)
+
+
+class SpooledUpload:
+    """Copy of an uploaded file that stays readable after the request's form files are closed."""
+
+    def __init__(self, filename: Optional[str], content_type: Optional[str], file):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = file
+
+
+async def spool_uploads(files: List[UploadFile], max_bytes: int) -> List[SpooledUpload]:
+    """
+    Copy the uploads to spooled temporary files before the response starts.
+
+    Depending on the FastAPI version, form files are closed once the endpoint
+    returns, before a StreamingResponse body has been produced. Uploads larger
+    than `max_bytes` in total are rejected with a 413.
+    """
+    spooled = []
+    received = 0
+    try:
+        for upload in files:
+            copy = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            spooled.append(SpooledUpload(upload.filename, upload.content_type, copy))
+            await upload.seek(0)
+            while chunk := await upload.read(1024 * 1024):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Bulk upload is too large. Maximum is {max_bytes} bytes.")
+                await asyncio.to_thread(copy.write, chunk)
+            copy.seek(0)
+    except BaseException:
+        for upload in spooled:
+            upload.file.close()
+        raise
+    return spooled
+
+
+def _read_limited(fileobj, name: str, max_bytes: int) -> BulkItem:
+    data = fileobj.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return name, None, f"File exceeds {max_bytes} bytes."
+    return name, data, None
+
+
+def iter_upload_images(files: List[SpooledUpload], max_file_bytes: int, max_total_bytes: int) -> Iterator[BulkItem]:
+    """
+    Yield every image contained in the uploads, one at a time.
+
+    Plain uploads are yielded as-is. Zip archives are read member by member and
+    tar archives (optionally compressed) are read as a stream, so only one image
+    is held in memory at a time. A member that cannot be read becomes an error
+    item, and once `max_total_bytes` of (decompressed) images have been read,
+    the rest of the upload is skipped with an error item.
+    """
+    total_bytes = 0
+    skipped = False
+
+    def read(fileobj, item_name: str) -> BulkItem:
+        nonlocal total_bytes
+        try:
+            item = _read_limited(fileobj, item_name, max_file_bytes)
+        except Exception as e:  # Corrupt member: zlib.error, EOFError, OSError, ...
+            logging.error(f"Could not read '{item_name}': {e}")
+            return item_name, None, f"Could not read file: {e}"
+        total_bytes += len(item[1] or b"")
+        return item
+
+    for upload in files:
+        name = upload.filename or "upload"
+        lower_name = name.lower()
+        upload.file.seek(0)
+
+        try:
+            if lower_name.endswith(ZIP_EXTENSIONS) or upload.content_type == "application/zip":
+                with zipfile.ZipFile(upload.file) as archive:
+                    for info in archive.infolist():
+                        if info.is_dir():
+                            continue
+                        if total_bytes >= max_total_bytes:
+                            skipped = True
+                            break
+                        member_name = f"{name}/{info.filename}"
+                        if info.file_size > max_file_bytes:
+                            yield member_name, None, f"File exceeds {max_file_bytes} bytes."
+                            continue
+                        try:
+                            member = archive.open(info)
+                        except Exception as e:  # Encrypted or unsupported compression
+                            yield member_name, None, f"Could not read file: {e}"
+                            continue
+                        with member:
+                            yield read(member, member_name)
+
+            elif lower_name.endswith(TAR_EXTENSIONS) or upload.content_type in ("application/x-tar", "application/gzip"):
+                with tarfile.open(fileobj=upload.file, mode="r|*") as archive:
+                    for member in archive:
+                        if not member.isfile():
+                            continue
+                        if total_bytes >= max_total_bytes:
+                            skipped = True
+                            break
+                        member_name = f"{name}/{member.name}"
+                        if member.size > max_file_bytes:
+                            yield member_name, None, f"File exceeds {max_file_bytes} bytes."
+                            continue
+                        yield read(archive.extractfile(member), member_name)
+
+            elif total_bytes >= max_total_bytes:
+                skipped = True
+            else:
+                yield read(upload.file, name)
+
+        except Exception as e:  # BadZipFile, TarError, or a compressed stream that breaks between members
+            logging.error(f"Invalid archive '{name}': {e}")
+            yield name, None, f"Invalid archive: {e}"
+
+        if skipped:
+            logging.warning(f"Bulk upload stopped after {total_bytes} bytes of images (BULK_MAX_TOTAL_BYTES).")
+            yield name, None, f"Upload exceeds {max_total_bytes} bytes of images; the remaining files were skipped."
+            return
+
+
+def classify_item(image_bytes: bytes) -> dict:
+    """
+    Validate and classify a single image from a bulk upload.
+
+    Runs on an executor thread with a session of its own: sessions are not
+    thread-safe, and a short-lived one never holds a pooled connection (or an
+    open transaction) for the length of the whole job.
+    """
+    image_format = imghdr.what(None, image_bytes)
+    if image_format not in SUPPORTED_IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {image_format}")
+    with SessionLocal() as db:
+        return classification_service.classify_waste(image_bytes, db)
+
+
+async def _submit(image_bytes: bytes) -> dict:
+    """
+    Queue one image on the inference pool within the bulk slot budget, waiting
+    for room for at most BULK_MAX_WAIT_SECONDS before failing the item.
+    """
+    busy = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Classification service is busy.")
+    deadline = time.monotonic() + settings.BULK_MAX_WAIT_SECONDS
+    try:
+        await asyncio.wait_for(_bulk_slots.acquire(), settings.BULK_MAX_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise busy
+    try:
+        while True:
+            try:
+                return await inference_executor.run(classify_item, image_bytes)
+            except ExecutorSaturatedError as e:
+                if time.monotonic() + e.retry_after > deadline:
+                    raise busy
+                await asyncio.sleep(e.retry_after)
+    finally:
+        _bulk_slots.release()
+
+
+def _line(payload: dict) -> str:
+    return json.dumps(payload, default=str) + "\n"
+
+
+async def stream_bulk_classification(files: List[SpooledUpload]) -> AsyncIterator[str]:
+    """
+    Classify every image in the uploads and yield one NDJSON line per image.
+
+    At most BULK_MAX_IN_FLIGHT images are being classified at once, which keeps
+    the micro-batcher fed without reading the whole upload ahead. Lines are
+    emitted in completion order; each carries the image's index and name.
+    Images beyond BULK_MAX_ITEMS are not classified and the summary line is
+    marked `truncated`.
+    """
+    start_time = time.time()
+    items = iter_upload_images(files, settings.BULK_MAX_FILE_BYTES, settings.BULK_MAX_TOTAL_BYTES)
+    pending = {}
+    index = 0
+    processed = failed = 0
+    exhausted = truncated = False
+
+    try:
+        while not exhausted or pending:
+            while not exhausted and len(pending) < settings.BULK_MAX_IN_FLIGHT:
+                item = await asyncio.to_thread(next, items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if index >= settings.BULK_MAX_ITEMS:
+                    exhausted = truncated = True
+                    logging.warning(f"Bulk upload truncated after {settings.BULK_MAX_ITEMS} images")
+                    break
+                name, image_bytes, error = item
+                if error:
+                    failed += 1
+                    yield _line({"index": index, "filename": name, "success": False, "error": error})
+                else:
+                    task = asyncio.create_task(_submit(image_bytes))
+                    pending[task] = (index, name)
+                index += 1
+
+            if not pending:
+                continue
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item_index, name = pending.pop(task)
+                try:
+                    result = task.result()
+                    processed += 1
+                    yield _line({
+                        "index": item_index,
+                        "filename": name,
+                        "success": True,
+                        "model_version": result["model_version"],
+                        "classification": result["detected_items"],
+                    })
+                except HTTPException as e:
+                    failed += 1
+                    yield _line({"index": item_index, "filename": name, "success": False, "error": e.detail})
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"Bulk classification failed for '{name}': {e}")
+                    yield _line({"index": item_index, "filename": name, "success": False, "error": "Classification failed."})
+
+        execution_time = time.time() - start_time
+        logging.info(f"Bulk classification of {processed + failed} image(s) took {execution_time:.2f} seconds")
+        yield _line({
+            "summary": True,
+            "processed": processed,
+            "failed": failed,
+            "truncated": truncated,
+            "max_items": settings.BULK_MAX_ITEMS,
+            "execution_time": execution_time,
+        })
+
+    finally:
+        for task in pending:
+            task.cancel()
+        for upload in files:
+            upload.file.close()
@@ -0,0 +1,167 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+from sqlalchemy.orm import Session, joinedload, selectinload
+from ..models.waste_models import WasteType
+from ..config.db_config import settings
+from ..utils.lookup_keys import normalize_waste_name
+
+logging.basicConfig(level=logging.INFO)
+
+NOT_AVAILABLE = "Not Available"
+
+try:
+    with open("data/weights.json", "r") as f:
+        weights_data = json.load(f)
+        logging.info("Weights data loaded successfully.")
+except Exception as e:
+    logging.error(f"Error loading weights.json: {e}")
+    weights_data = {}
+
+def get_estimated_weight(waste_name: str) -> float:
+    weight_str = weights_data.get(waste_name, "Unknown")
+    if weight_str.lower() == "unknown":
+        logging.warning(f"Weight not found for: {waste_name}")
+        return 0.0
+    try:
+        return float(weight_str.replace(" grams", "").strip())
+    except ValueError:
+        logging.warning(f"Invalid weight format for: {waste_name}")
+        return 0.0
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A waste type with its recycling and decomposition details already resolved."""
+    waste_type_id: Any
+    name: str
+    category: str
+    estimated_weight: float
+    recycling_instructions: Any
+    decomposition_methods: Mapping[str, Any]
+
+    def to_item(self, confidence: float) -> dict:
+        """Build the classification response item for a detection of this type."""
+        return {
+            "waste_name": self.name,
+            "category": self.category,
+            "confidence": confidence,
+            "estimated_weight": self.estimated_weight,
+            "recycling_instructions": self.recycling_instructions,
+            "decomposition_methods": dict(self.decomposition_methods),
+        }
+
+
+@dataclass
+class CatalogSnapshot:
+    """Immutable view of the waste catalog keyed by normalized name."""
+    entries: Mapping[str, CatalogEntry]
+    built_at: float = field(default_factory=time.monotonic)
+    # Memo of partial-name matches so repeated labels resolve in O(1)
+    _resolved: Dict[str, Optional[CatalogEntry]] = field(default_factory=dict, repr=False)
+
+    def lookup(self, name: str) -> Optional[CatalogEntry]:
+        key = normalize_waste_name(name)
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+        if key in self._resolved:
+            return self._resolved[key]
+
+        # Same semantics as the old ILIKE '%name%' query: first type whose name contains the label
+        entry = next((e for k, e in self.entries.items() if key and key in k), None)
+        self._resolved[key] = entry
+        return entry
+
+
+def _build_entry(waste_type: WasteType) -> CatalogEntry:
+    recycling = waste_type.recycling_instructions
+    decomposition = waste_type.decomposition_info
+    return CatalogEntry(
+        waste_type_id=waste_type.id,
+        name=waste_type.name,
+        category=waste_type.category,
+        estimated_weight=get_estimated_weight(waste_type.name),
+        recycling_instructions=recycling.instructions if recycling else NOT_AVAILABLE,
+        decomposition_methods=MappingProxyType({
+            "landfill": decomposition.landfill_decomposition if decomposition else NOT_AVAILABLE,
+            "ocean": decomposition.ocean_decomposition if decomposition else NOT_AVAILABLE,
+            "buried": decomposition.buried_decomposition if decomposition else NOT_AVAILABLE,
+            "open_environment": decomposition.open_environment_decomposition if decomposition else NOT_AVAILABLE,
+        }),
+    )
+
+
+class WasteCatalog:
+    """
+    In-memory index of waste types, recycling instructions and decomposition info.
+
+    The whole catalog is loaded with a single query and swapped in as a new
+    snapshot on rebuild, so readers never see a half-built index and never hit
+    the database on the classification path.
+    """
+
+    def __init__(self, refresh_seconds: float = 0):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def build(self, db: Session) -> CatalogSnapshot:
+        """Load the catalog from the database into a new snapshot."""
+        start_time = time.time()
+        waste_types = (
+            db.query(WasteType)
+            .options(
+                joinedload(WasteType.recycling_instructions),
+                joinedload(WasteType.decomposition_info),
+                selectinload(WasteType.aliases),
+            )
+            .all()
+        )
+        entries = {}
+        for waste_type in waste_types:
+            entries.setdefault(waste_type.lookup_key, _build_entry(waste_type))
+        # Aliases (YOLO labels, synonyms) point at their type's entry; a type's own name always wins
+        for waste_type in waste_types:
+            entry = entries[waste_type.lookup_key]
+            for alias in waste_type.aliases:
+                entries.setdefault(alias.lookup_key, entry)
+
+        snapshot = CatalogSnapshot(entries=MappingProxyType(entries))
+        logging.info(f"Waste catalog built with {len(entries)} entries in {time.time() - start_time:.3f} seconds")
+        return snapshot
+
+    def rebuild(self, db: Session) -> CatalogSnapshot:
+        """Rebuild the catalog and atomically replace the current snapshot."""
+        with self._lock:
+            self._snapshot = self.build(db)
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop the current snapshot so the next lookup reloads it."""
+        self._snapshot = None
+
+    def _is_stale(self, snapshot: CatalogSnapshot) -> bool:
+        return self.refresh_seconds > 0 and time.monotonic() - snapshot.built_at > self.refresh_seconds
+
+    def get_snapshot(self, db: Session) -> CatalogSnapshot:
+        """Return the current snapshot, loading it first if it is missing or stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_stale(snapshot):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._is_stale(snapshot):
+                snapshot = self._snapshot = self.build(db)
+            return snapshot
+
+    def lookup(self, name: str, db: Session) -> Optional[CatalogEntry]:
+        """Find the catalog entry for a detected class name."""
+        return self.get_snapshot(db).lookup(name)
+
+
+# Shared catalog used by classification and refreshed by the admin endpoints
+waste_catalog = WasteCatalog(refresh_seconds=settings.CATALOG_REFRESH_SECONDS)
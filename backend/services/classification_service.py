@@ -1,131 +1,309 @@
 from ultralytics import YOLO
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from PIL import Image
-import io, time, logging, json, torch
+import functools, os, time, logging, torch
 import numpy as np
-from datetime import datetime
-from ..models.waste_models import WasteType, RecyclingInstructions, DecompositionInfo
+from typing import Optional, Tuple
 from ..config.db_config import settings
+from .detector_service import DetectorManager, DetectorVersion
+from .catalog_service import waste_catalog, get_estimated_weight, NOT_AVAILABLE
+from .result_cache import ResultCache, content_hash, perceptual_hash
+from . import image_preprocessing
+from .inference_backends import export_model
+from .model_registry import model_registry
+from .metrics_service import metrics
+from .timing_service import stage
+from .history_service import classification_history
 
 logging.basicConfig(level=logging.INFO)
 
-try:
-    with open("data/weights.json", "r") as f:
-        weights_data = json.load(f)
-        logging.info("Weights data loaded successfully.")
-except Exception as e:
-    logging.error(f"Error loading weights.json: {e}")
-    weights_data = {}
-
-def get_estimated_weight(waste_name: str) -> float:
-    weight_str = weights_data.get(waste_name, "Unknown")
-    if weight_str.lower() == "unknown":
-        logging.warning(f"Weight not found for: {waste_name}")
-        return 0.0
+def load_yolo_model(model_path: str = settings.MODEL_PATH, backend: str = settings.INFERENCE_BACKEND):
     try:
-        return float(weight_str.replace(" grams", "").strip())
-    except ValueError:
-        logging.warning(f"Invalid weight format for: {waste_name}")
-        return 0.0
-
-def load_yolo_model():
-    try:
-        model = YOLO(settings.MODEL_PATH)
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        model.to(device)
-        logging.info(f"YOLO model loaded on {device}.")
+        export_path = export_model(
+            model_path,
+            backend,
+            settings.MODEL_EXPORT_DIR,
+            imgsz=settings.MODEL_EXPORT_IMGSZ,
+            int8=settings.MODEL_INT8,
+            calibration_dir=settings.MODEL_CALIBRATION_DIR,
+            calibration_size=settings.MODEL_CALIBRATION_SIZE,
+        )
+        model = YOLO(export_path, task="detect")
+        if backend == "torch":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model.to(device)
+        else:
+            device = "cpu"
+        logging.info(f"YOLO model loaded from {export_path} ({backend}) on {device}.")
         return model
     except Exception as e:
         logging.error(f"Error loading YOLO model: {e}")
         raise RuntimeError("Failed to load YOLO model.")
 
-# Load the YOLO model at startup
-model = load_yolo_model()
-
-def classify_waste(image_bytes: bytes, db: Session):
+def get_model_version(model_path: str) -> str:
+    """Identify the weights on disk so cached results never outlive a model swap."""
+    backend = settings.INFERENCE_BACKEND + ("-int8" if settings.MODEL_INT8 and settings.INFERENCE_BACKEND != "torch" else "")
     try:
-        start_time = time.time()
+        stat = os.stat(model_path)
+        return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}:{backend}"
+    except OSError:
+        return f"{os.path.basename(model_path)}:{backend}"
 
-        # Validate and process image
-        try:
-            img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            img = img.resize((512, 512))  # Reduced size for better detection
-            img_array = np.array(img)
-        except Exception as e:
-            logging.error(f"Invalid image format: {e}")
-            raise HTTPException(status_code=400, detail="Invalid image format.")
+def predict_batch(model, images: list) -> list:
+    """Run a YOLO model once over a batch of preprocessed images."""
+    device = "cuda" if torch.cuda.is_available() and settings.INFERENCE_BACKEND == "torch" else "cpu"
+    return model.predict(images, device=device, conf=settings.CONFIDENCE_THRESHOLD, verbose=False)
+
+def warmup_yolo_model(model):
+    """Run synthetic inferences so the first real request does not pay for cold kernels."""
+    blank = np.full((settings.IMAGE_SIZE, settings.IMAGE_SIZE, 3), 114, dtype=np.uint8)
+    for batch_size in sorted({1, settings.BATCH_MAX_SIZE}):
+        predict_batch(model, [blank] * batch_size)
+
+# Versioned detectors, each with its own micro-batcher that coalesces concurrent requests
+detector_manager = DetectorManager(
+    loader=load_yolo_model,
+    warmup=warmup_yolo_model,
+    predict_fn=predict_batch,
+    version_of=get_model_version,
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+    shadow_sample_rate=settings.SHADOW_SAMPLE_RATE,
+)
+
+def load_detector() -> DetectorManager:
+    """Activate the configured weights unless a version is already serving."""
+    if detector_manager.active is None:
+        detector_manager.activate(settings.MODEL_PATH)
+    return detector_manager
+
+# The YOLO model is loaded by the app lifespan (or lazily on first use)
+model_registry.register("yolo", load_detector)
 
+metrics.gauge_callback(
+    "sustainaware_detector_queue_depth",
+    "Images waiting for the next detector batch, by role.",
+    lambda: {
+        (role,): detector.batcher.pending
+        for role, detector in (("active", detector_manager.active), ("shadow", detector_manager.shadow))
+        if detector is not None
+    },
+    ("role",),
+)
+
+# Cache of detections for repeated uploads of the same image
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+)
+
+metrics.gauge_callback(
+    "sustainaware_result_cache_hit_ratio",
+    "Share of result cache lookups that were hits since startup.",
+    lambda: result_cache.stats()["hit_ratio"],
+)
+metrics.counter_callback(
+    "sustainaware_result_cache_lookups_total",
+    "Result cache lookups since startup, by outcome.",
+    lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses},
+    ("outcome",),
+)
+metrics.gauge_callback(
+    "sustainaware_result_cache_entries",
+    "Entries currently held in the result cache.",
+    lambda: result_cache.stats()["entries"],
+)
+
+def get_cache_key(image_bytes: bytes, model_version: str) -> str:
+    """Build the result cache key from the image hash, model version and confidence threshold."""
+    if settings.RESULT_CACHE_HASH_MODE == "phash":
         try:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            results = model.predict(img_array, device=device, conf=0.5)  # Reduced confidence threshold
-
-            detected_items_dict = {}
-
-            if not results or not hasattr(results[0], "boxes"):
-                raise HTTPException(status_code=500, detail="YOLO model did not return valid detections.")
-
-            for box in results[0].boxes:
-                class_id = int(box.cls)
-                confidence = float(box.conf)
-                detected_name = results[0].names.get(class_id, "Unknown").replace("-", " ").replace("_", " ")
-                
-                logging.info(f"Detected: {detected_name} (Confidence: {confidence})")
-                
-                if detected_name in detected_items_dict:
-                    if detected_items_dict[detected_name]["confidence"] < confidence:
-                        detected_items_dict[detected_name]["confidence"] = confidence
-                else:
-                    detected_items_dict[detected_name] = {"confidence": confidence}
-
-            detected_items = []
-            for detected_name, data in detected_items_dict.items():
-                confidence = data["confidence"]
-
-                waste_type = db.query(WasteType).filter(WasteType.name.ilike(f"%{detected_name}%")).first()
-                
-                if not waste_type:
-                    logging.warning(f"No database match found for: {detected_name}")
-
-                recycling_instruction = None
-                decomposition_info = None
-
-                if waste_type:
-                    recycling_instruction = db.query(RecyclingInstructions).filter_by(waste_type_id=waste_type.id).first()
-                    decomposition_info = db.query(DecompositionInfo).filter_by(waste_type_id=waste_type.id).first()
-                    estimated_weight = get_estimated_weight(waste_type.name)
-                    category = waste_type.category
-                else:
-                    estimated_weight = get_estimated_weight(detected_name)
-                    category = "Unknown"
-
-                detected_item = {
-                    "waste_name": waste_type.name if waste_type else detected_name,
-                    "category": category,
-                    "confidence": confidence,
-                    "estimated_weight": estimated_weight,
-                    "recycling_instructions": recycling_instruction.instructions if recycling_instruction else "Not Available",
-                    "decomposition_methods": {
-                        "landfill": decomposition_info.landfill_decomposition if decomposition_info else "Not Available",
-                        "ocean": decomposition_info.ocean_decomposition if decomposition_info else "Not Available",
-                        "buried": decomposition_info.buried_decomposition if decomposition_info else "Not Available",
-                        "open_environment": decomposition_info.open_environment_decomposition if decomposition_info else "Not Available"
-                    }
+            image_hash = f"phash:{perceptual_hash(image_bytes)}"
+        except Exception:
+            image_hash = f"sha256:{content_hash(image_bytes)}"
+    else:
+        image_hash = f"sha256:{content_hash(image_bytes)}"
+    return f"{model_version}|conf={settings.CONFIDENCE_THRESHOLD}|{image_hash}"
+
+def preprocess_image(image_bytes: bytes) -> Tuple[np.ndarray, tuple]:
+    """Decode the uploaded image into the array fed to the model, with the box the image fills in it."""
+    return image_preprocessing.preprocess_image_with_box(
+        image_bytes, size=settings.IMAGE_SIZE, max_pixels=settings.MAX_IMAGE_PIXELS
+    )
+
+# Normalized class names per model, keyed by the identity of the model's names dict
+_class_name_cache: dict = {}
+
+def get_class_names(names: dict) -> list:
+    """Normalize a model's class labels once and index them by class id."""
+    cached = _class_name_cache.get(id(names))
+    if cached is not None and cached[0] is names:
+        return cached[1]
+    size = max(names, default=-1) + 1
+    normalized = [names.get(class_id, "Unknown").replace("-", " ").replace("_", " ") for class_id in range(size)]
+    _class_name_cache[id(names)] = (names, normalized)
+    return normalized
+
+def summarize_result(result, content_box: Optional[tuple] = None) -> dict:
+    """
+    Reduce a single YOLO result to per-class statistics.
+
+    Per-class max confidence, box count and summed box area are computed with
+    NumPy over all boxes at once instead of looping over them in Python. With
+    the letterbox `content_box`, box areas are clipped to it and taken as a
+    fraction of it, so padding does not count as part of the image.
+    """
+    if result is None or not hasattr(result, "boxes"):
+        raise HTTPException(status_code=500, detail="YOLO model did not return valid detections.")
+
+    boxes = result.boxes
+    if len(boxes) == 0:
+        return {}
+
+    class_names = get_class_names(result.names)
+    class_ids = boxes.cls.cpu().numpy().astype(np.intp)
+    confidences = boxes.conf.cpu().numpy().astype(np.float64)
+    xyxy = boxes.xyxy.cpu().numpy()
+    if content_box is not None:
+        left, top, right, bottom = content_box
+        xyxy = np.clip(xyxy, [left, top, left, top], [right, bottom, right, bottom])
+        image_area = float((right - left) * (bottom - top))
+    else:
+        image_area = float(result.orig_shape[0] * result.orig_shape[1])
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+
+    num_classes = max(len(class_names), int(class_ids.max()) + 1)
+    counts = np.bincount(class_ids, minlength=num_classes)
+    area_sums = np.bincount(class_ids, weights=areas, minlength=num_classes)
+    max_confidences = np.zeros(num_classes)
+    np.maximum.at(max_confidences, class_ids, confidences)
+
+    detected_items_dict = {}
+    for class_id in np.flatnonzero(counts).tolist():
+        name = class_names[class_id] if class_id < len(class_names) else "Unknown"
+        detected_items_dict[name] = {
+            "confidence": float(max_confidences[class_id]),
+            "count": int(counts[class_id]),
+            "box_area_fraction": float(area_sums[class_id]) / image_area if image_area else 0.0,
+        }
+
+    logging.info(f"Detected {len(class_ids)} box(es): " + ", ".join(
+        f"{name} x{data['count']} ({data['confidence']:.2f})" for name, data in detected_items_dict.items()
+    ))
+    return detected_items_dict
+
+def detect(img_array: np.ndarray, detector: DetectorVersion, content_box: Optional[tuple] = None) -> dict:
+    """Run the detector and keep the highest confidence per detected class."""
+    start_time = time.perf_counter()
+    summarize = functools.partial(summarize_result, content_box=content_box)
+    with stage("inference"):
+        result = detector.predict(img_array)
+    with stage("postprocess"):
+        detected_items_dict = summarize(result)
+    detector_manager.maybe_shadow(img_array, detected_items_dict, time.perf_counter() - start_time, summarize)
+    return detected_items_dict
+
+def extract_boxes(result) -> list:
+    """List every detection of a YOLO result as (class name, confidence, xyxy box)."""
+    if result is None or not hasattr(result, "boxes"):
+        raise HTTPException(status_code=500, detail="YOLO model did not return valid detections.")
+
+    class_names = get_class_names(result.names)
+    boxes = result.boxes
+    class_ids = boxes.cls.int().tolist()
+    confidences = boxes.conf.tolist()
+    coordinates = boxes.xyxy.tolist()
+    return [
+        (class_names[class_id] if class_id < len(class_names) else "Unknown", confidence, box)
+        for class_id, confidence, box in zip(class_ids, confidences, coordinates)
+    ]
+
+def detect_objects(image_bytes: bytes) -> dict:
+    """Run the detector on one video frame and return every box, bypassing the result cache."""
+    model_registry.get("yolo")
+    img_array, _ = preprocess_image(image_bytes)
+    with detector_manager.use() as detector:
+        detections = extract_boxes(detector.predict(img_array))
+    return {"detections": detections, "model_version": detector.version}
+
+def enrich_detections(detected_items_dict: dict, db: Session) -> list:
+    """Attach catalog details, item counts and total weight to each detected class."""
+    detected_items = []
+    for detected_name, data in detected_items_dict.items():
+        confidence = data["confidence"]
+        count = data.get("count", 1)
+
+        catalog_entry = waste_catalog.lookup(detected_name, db)
+        if catalog_entry:
+            detected_item = catalog_entry.to_item(confidence)
+        else:
+            logging.warning(f"No database match found for: {detected_name}")
+            detected_item = {
+                "waste_name": detected_name,
+                "category": "Unknown",
+                "confidence": confidence,
+                "estimated_weight": get_estimated_weight(detected_name),
+                "recycling_instructions": NOT_AVAILABLE,
+                "decomposition_methods": {
+                    "landfill": NOT_AVAILABLE,
+                    "ocean": NOT_AVAILABLE,
+                    "buried": NOT_AVAILABLE,
+                    "open_environment": NOT_AVAILABLE
                 }
+            }
+
+        detected_item["item_count"] = count
+        detected_item["total_estimated_weight"] = detected_item["estimated_weight"] * count
+        if "box_area_fraction" in data:
+            detected_item["box_area_fraction"] = data["box_area_fraction"]
+        detected_items.append(detected_item)
+    return detected_items
+
+def classify_waste(image_bytes: bytes, db: Session, user_id=None) -> dict:
+    """
+    Classify an image and return the enriched items with the model version that served them.
+
+    The items are also queued for the write-behind history writer, which never blocks.
+    """
+    try:
+        start_time = time.time()
+
+        model_registry.get("yolo")
+        with detector_manager.use() as detector:
+            with stage("cache"):
+                cache_key = get_cache_key(image_bytes, detector.version) if settings.RESULT_CACHE_ENABLED else None
+                detected_items_dict = result_cache.get(cache_key) if cache_key else None
+
+            if detected_items_dict is None:
+                # Validate and process image
+                with stage("decode"):
+                    img_array, content_box = preprocess_image(image_bytes)
+
+                try:
+                    detected_items_dict = detect(img_array, detector, content_box)
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    logging.error(f"Error during classification: {e}")
+                    raise HTTPException(status_code=500, detail="Classification failed.")
 
-                detected_items.append(detected_item)
+                if cache_key:
+                    result_cache.put(cache_key, detected_items_dict)
+            else:
+                logging.info("Classification result served from cache.")
 
-            execution_time = time.time() - start_time
-            logging.info(f"Total classify_waste execution time: {execution_time:.2f} seconds")
+        with stage("enrich"):
+            detected_items = enrich_detections(detected_items_dict, db)
+        classification_history.record(detected_items, detector.version, user_id)
 
-            return detected_items 
+        execution_time = time.time() - start_time
+        logging.info(f"Total classify_waste execution time: {execution_time:.2f} seconds")
 
-        except Exception as e:
-            logging.error(f"Error during classification: {e}")
-            raise HTTPException(status_code=500, detail="Classification failed.")
+        return {"detected_items": detected_items, "model_version": detector.version}
 
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"Error in classify_waste: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -0,0 +1,284 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Iterator, List, Optional
+from .batching_service import MicroBatcher
+
+logging.basicConfig(level=logging.INFO)
+
+
+class DetectorVersion:
+    """
+    One loaded version of the detector with its own micro-batcher.
+
+    Requests hold a reference while they use it, so a retired version keeps
+    serving the requests it already accepted and shuts its batcher down once
+    the last one finishes.
+    """
+
+    def __init__(self, version: str, model_path: str, model: Any, predict_fn: Callable[[Any, list], list],
+                 max_batch_size: int, max_wait_ms: float):
+        self.version = version
+        self.model_path = model_path
+        self.model = model
+        self.loaded_at = datetime.utcnow()
+        self.batcher = MicroBatcher(
+            lambda images: predict_fn(self.model, images),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name=f"yolo-batcher-{version}",
+            metrics_label="yolo",
+        )
+        self._in_flight = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def retired(self) -> bool:
+        return self._retired
+
+    def acquire(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            drained = self._retired and self._in_flight == 0
+        if drained:
+            self._close()
+
+    def retire(self):
+        """Stop taking new requests; close as soon as in-flight requests finish."""
+        with self._lock:
+            self._retired = True
+            drained = self._in_flight == 0
+        if drained:
+            self._close()
+
+    def _close(self):
+        logging.info(f"Detector version {self.version} drained; releasing it.")
+        self.batcher.shutdown(wait=False)
+
+    def predict(self, image: Any) -> Any:
+        return self.batcher.predict(image)
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "model_path": self.model_path,
+            "loaded_at": self.loaded_at.isoformat(),
+            "in_flight": self._in_flight,
+        }
+
+
+class DetectorManager:
+    """
+    Versioned registry of detector models with atomic hot-swap and shadow mode.
+
+    A new version is loaded and warmed up off the request path and then
+    published with a single reference assignment. Requests that started on the
+    old version finish on it. An optional shadow version runs on a sample of
+    traffic so its latency and detections can be compared with the active one.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Any],
+        warmup: Callable[[Any], None],
+        predict_fn: Callable[[Any, list], list],
+        version_of: Callable[[str], str],
+        max_batch_size: int,
+        max_wait_ms: float,
+        shadow_sample_rate: float = 0.0,
+        history_size: int = 10,
+    ):
+        self.loader = loader
+        self.warmup = warmup
+        self.predict_fn = predict_fn
+        self.version_of = version_of
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.shadow_sample_rate = shadow_sample_rate
+        self.history_size = history_size
+
+        self.active: Optional[DetectorVersion] = None
+        self.shadow: Optional[DetectorVersion] = None
+        self.loading: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.history: List[dict] = []
+
+        self._swap_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    def load_version(self, model_path: str) -> DetectorVersion:
+        """Load and warm up a detector version without publishing it."""
+        version = self.version_of(model_path)
+        start_time = time.perf_counter()
+        model = self.loader(model_path)
+        self.warmup(model)
+        logging.info(f"Detector version {version} loaded and warmed up in {time.perf_counter() - start_time:.2f} seconds")
+        return DetectorVersion(version, model_path, model, self.predict_fn, self.max_batch_size, self.max_wait_ms)
+
+    def _record(self, event: str, version: str):
+        self.history.append({"event": event, "version": version, "at": datetime.utcnow().isoformat()})
+        del self.history[:-self.history_size]
+
+    def activate(self, model_path: str, shadow: bool = False) -> DetectorVersion:
+        """Load `model_path` and swap it in as the active (or shadow) version."""
+        with self._swap_lock:
+            self.loading = model_path
+            self.last_error = None
+            try:
+                new_version = self.load_version(model_path)
+            except Exception as e:
+                self.last_error = str(e)
+                logging.error(f"Error loading detector from {model_path}: {e}")
+                raise
+            finally:
+                self.loading = None
+
+            if shadow:
+                old, self.shadow = self.shadow, new_version
+                self._record("shadow", new_version.version)
+            else:
+                old, self.active = self.active, new_version
+                self._record("activate", new_version.version)
+            logging.info(f"Detector version {new_version.version} is now {'shadow' if shadow else 'active'}.")
+
+        if old is not None:
+            old.retire()
+        return new_version
+
+    def clear_shadow(self):
+        with self._swap_lock:
+            old, self.shadow = self.shadow, None
+        if old is not None:
+            self._record("clear_shadow", old.version)
+            old.retire()
+
+    @contextmanager
+    def use(self) -> Iterator[DetectorVersion]:
+        """Pin the active version for the duration of one request."""
+        while True:
+            detector = self.active
+            if detector is None:
+                raise RuntimeError("No detector version is loaded.")
+            detector.acquire()
+            if not detector.retired:
+                break
+            # Lost a race with a swap; pin the new version instead
+            detector.release()
+        try:
+            yield detector
+        finally:
+            detector.release()
+
+    def maybe_shadow(self, image: Any, primary_summary: dict, primary_seconds: float,
+                     summarize: Callable[[Any], dict]):
+        """Run the shadow version on a sample of traffic and log how it differs."""
+        shadow = self.shadow
+        if shadow is None or random.random() >= self.shadow_sample_rate:
+            return
+        # Never let the shadow build up a backlog behind the active model
+        if shadow.in_flight >= self.max_batch_size:
+            return
+
+        shadow.acquire()
+        start_time = time.perf_counter()
+        try:
+            future = shadow.batcher.submit(image)
+        except Exception:
+            shadow.release()
+            return
+
+        def _compare(done):
+            try:
+                shadow_seconds = time.perf_counter() - start_time
+                shadow_summary = summarize(done.result())
+                added = sorted(set(shadow_summary) - set(primary_summary))
+                missing = sorted(set(primary_summary) - set(shadow_summary))
+                confidence_deltas = {
+                    name: round(shadow_summary[name]["confidence"] - primary_summary[name]["confidence"], 4)
+                    for name in set(primary_summary) & set(shadow_summary)
+                }
+                logging.info(
+                    f"Shadow {shadow.version} vs active: latency {shadow_seconds * 1000:.1f}ms vs "
+                    f"{primary_seconds * 1000:.1f}ms, added={added}, missing={missing}, "
+                    f"confidence_deltas={confidence_deltas}"
+                )
+            except Exception as e:
+                logging.error(f"Shadow inference on {shadow.version} failed: {e}")
+            finally:
+                shadow.release()
+
+        future.add_done_callback(_compare)
+
+    def start_watching(self, model_path: str, interval: float, max_backoff: float = 300.0):
+        """
+        Poll `model_path` and hot-swap whenever the weights file changes.
+
+        Weights that fail to load are not retried until the file changes again,
+        and after consecutive failures polling backs off exponentially (up to
+        `max_backoff` seconds), e.g. while a large file is still being copied.
+        """
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def _watch():
+            last_seen = self.version_of(model_path)
+            failed_version = None
+            failures = 0
+            wait = interval
+            while not self._stop_watching.wait(wait):
+                wait = interval
+                if not os.path.exists(model_path):
+                    continue
+                current = self.version_of(model_path)
+                if current in (last_seen, failed_version):
+                    continue
+                logging.info(f"Detected new weights at {model_path}; hot-swapping.")
+                try:
+                    self.activate(model_path)
+                except Exception:
+                    # activate() has logged the error and kept the current version
+                    failed_version = current
+                    failures += 1
+                    wait = min(max_backoff, interval * 2 ** failures)
+                    self._record("failed", current)
+                    logging.warning(
+                        f"Not retrying {model_path} ({current}) until it changes; next check in {wait:g}s."
+                    )
+                    continue
+                last_seen = current
+                failed_version = None
+                failures = 0
+
+        self._watcher = threading.Thread(target=_watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def shutdown(self):
+        """Stop the watcher and retire all versions."""
+        self._stop_watching.set()
+        for detector in (self.active, self.shadow):
+            if detector is not None:
+                detector.retire()
+
+    def status(self) -> dict:
+        return {
+            "active": self.active.status() if self.active else None,
+            "shadow": self.shadow.status() if self.shadow else None,
+            "shadow_sample_rate": self.shadow_sample_rate,
+            "loading": self.loading,
+            "last_error": self.last_error,
+            "history": list(self.history),
+        }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def content_hash(texts: Sequence[str], model_name: str, dtype: str) -> str:
+    """Identify an index by what was embedded and how, so any change forces a rebuild."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"model": model_name, "dtype": dtype, "texts": list(texts)}, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length, so a dot product is the cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the `k` highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class EmbeddingIndex:
+    """
+    Unit-normalized embedding matrix persisted as a .npy file next to a JSON manifest.
+
+    The matrix is opened with `mmap_mode="r"`, so loading it costs no embedding
+    and no copy, and every worker process on the host shares the same pages of
+    the OS page cache. Searches are a single matrix-vector product followed by
+    a top-k selection.
+    """
+
+    def __init__(self, keys: List[str], matrix: np.ndarray, manifest: dict):
+        self.keys = keys
+        self.matrix = matrix
+        self.manifest = manifest
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def manifest_path(index_dir: str, name: str) -> str:
+        return os.path.join(index_dir, f"{name}.manifest.json")
+
+    @classmethod
+    def load(cls, index_dir: str, name: str, expected_hash: Optional[str] = None) -> Optional["EmbeddingIndex"]:
+        """Memory-map a persisted index; None when it is missing, unreadable or stale."""
+        try:
+            with open(cls.manifest_path(index_dir, name), "r") as f:
+                manifest = json.load(f)
+            if expected_hash is not None and manifest.get("content_hash") != expected_hash:
+                return None
+            matrix = np.load(os.path.join(index_dir, manifest["matrix_file"]), mmap_mode="r")
+            if matrix.shape != (manifest["count"], manifest["dim"]):
+                logging.warning(f"Embedding index '{name}' has shape {matrix.shape}, expected "
+                                f"{(manifest['count'], manifest['dim'])}; rebuilding")
+                return None
+            return cls(manifest["keys"], matrix, manifest)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Could not load embedding index '{name}': {e}")
+            return None
+
+    @classmethod
+    def build(cls, index_dir: str, name: str, keys: Sequence[str], encode: Callable[[List[str]], np.ndarray],
+              model_name: str, dtype: str = "float32") -> "EmbeddingIndex":
+        """Embed `keys`, write the matrix and manifest atomically and return the memory-mapped result."""
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported index dtype '{dtype}'. Use one of: {', '.join(SUPPORTED_DTYPES)}.")
+        keys = list(keys)
+        digest = content_hash(keys, model_name, dtype)
+        start_time = time.time()
+        matrix = normalize_rows(encode(keys)).astype(dtype)
+
+        os.makedirs(index_dir, exist_ok=True)
+        matrix_file = f"{name}-{digest[:16]}.npy"
+        manifest = {
+            "name": name,
+            "model": model_name,
+            "dtype": dtype,
+            "count": int(matrix.shape[0]),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "content_hash": digest,
+            "matrix_file": matrix_file,
+            "keys": keys,
+            "built_at": datetime.utcnow().isoformat(),
+        }
+        # Write-then-rename, so workers starting concurrently never read a partial file
+        pid = os.getpid()
+        tmp_matrix = os.path.join(index_dir, f".{matrix_file}.{pid}.tmp")
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_matrix, os.path.join(index_dir, matrix_file))
+        tmp_manifest = cls.manifest_path(index_dir, name) + f".{pid}.tmp"
+        with open(tmp_manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest, cls.manifest_path(index_dir, name))
+
+        # Drop matrices of previous builds
+        for filename in os.listdir(index_dir):
+            if filename.startswith(f"{name}-") and filename.endswith(".npy") and filename != matrix_file:
+                try:
+                    os.remove(os.path.join(index_dir, filename))
+                except OSError:
+                    pass
+
+        logging.info(f"Embedding index '{name}' built with {len(keys)} entries in {time.time() - start_time:.2f} seconds")
+        # An empty knowledge base has no matrix worth mapping
+        return cls.load(index_dir, name, digest) or cls(keys, matrix, manifest)
+
+    @classmethod
+    def load_or_build(cls, index_dir: str, name: str, keys: Sequence[str], encode: Callable[[List[str]], np.ndarray],
+                      model_name: str, dtype: str = "float32") -> "EmbeddingIndex":
+        """Reuse the persisted index when it matches `keys`, model and dtype; otherwise rebuild it."""
+        index = cls.load(index_dir, name, content_hash(list(keys), model_name, dtype))
+        if index is not None:
+            logging.info(f"Embedding index '{name}' loaded from disk ({len(index)} entries, {index.manifest['dtype']})")
+            return index
+        return cls.build(index_dir, name, keys, encode, model_name, dtype)
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[int, float]]:
+        """Return the `k` most similar rows as (row, cosine similarity), best first."""
+        if len(self.keys) == 0:
+            return []
+        query = normalize_rows(query).reshape(-1)
+        scores = self.matrix @ query  # float16 indexes are promoted to float32 here
+        return [(int(i), float(scores[i])) for i in top_k(scores, k)]
@@ -0,0 +1,193 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, List, Sequence
+from uuid import UUID
+from fastapi import HTTPException, status
+from sqlalchemy import Select
+from ..config.db_config import AsyncSessionLocal
+
+logging.basicConfig(level=logging.INFO)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def check_format(export_format: str):
+    """Reject unknown formats before the response starts, while a status code can still be sent."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}."
+        )
+    if export_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Parquet export requires the pyarrow package."
+            )
+
+
+def export_filename(name: str, export_format: str) -> str:
+    return f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{EXPORT_FORMATS[export_format][1]}"
+
+
+def _plain(value):
+    """Convert a column value to something csv/json can write."""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class CsvEncoder:
+    def __init__(self, names: List[str], types: list):
+        self.names = names
+
+    def start(self) -> bytes:
+        return self._write([self.names])
+
+    def encode(self, rows: Sequence) -> bytes:
+        return self._write([["" if v is None else _plain(v) for v in row] for row in rows])
+
+    def finish(self) -> bytes:
+        return b""
+
+    def _write(self, rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+
+class NdjsonEncoder:
+    def __init__(self, names: List[str], types: list):
+        self.names = names
+
+    def start(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence) -> bytes:
+        lines = (json.dumps(dict(zip(self.names, map(_plain, row))), default=str) for row in rows)
+        return ("\n".join(lines) + "\n").encode()
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ParquetEncoder:
+    """Writes each batch as its own row group, so only one batch is ever buffered."""
+
+    def __init__(self, names: List[str], types: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.names = names
+        self.schema = pa.schema([(name, self._arrow_type(column_type)) for name, column_type in zip(names, types)])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode="w"), self.schema)
+
+    def _arrow_type(self, column_type):
+        pa = self.pa
+        try:
+            python_type = column_type.python_type
+        except NotImplementedError:
+            return pa.string()
+        if python_type is bool:
+            return pa.bool_()
+        if python_type is int:
+            return pa.int64()
+        if python_type is float:
+            return pa.float64()
+        if python_type is datetime:
+            return pa.timestamp("us")
+        return pa.string()
+
+    def _column(self, values: list, field):
+        if self.pa.types.is_string(field.type):
+            values = [v if v is None or isinstance(v, str) else
+                      json.dumps(v, default=str) if isinstance(v, (dict, list)) else str(v)
+                      for v in values]
+        return self.pa.array(values, type=field.type)
+
+    def start(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence) -> bytes:
+        columns = list(zip(*rows)) if rows else [[] for _ in self.names]
+        arrays = [self._column(list(values), field) for values, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+ENCODERS = {"csv": CsvEncoder, "ndjson": NdjsonEncoder, "parquet": ParquetEncoder}
+
+
+async def stream_export(stmt: Select, export_format: str, batch_size: int) -> AsyncIterator[bytes]:
+    """
+    Stream the rows of a query as an encoded file.
+
+    Rows come from a server-side cursor `batch_size` at a time and each batch
+    is encoded and sent before the next one is fetched, so memory use does not
+    grow with the size of the table. The session is owned by the generator
+    because the response body outlives the request's dependencies.
+    """
+    columns = list(stmt.selected_columns)
+    encoder = ENCODERS[export_format]([column.key for column in columns], [column.type for column in columns])
+    rows_exported = 0
+
+    chunk = encoder.start()
+    if chunk:
+        yield chunk
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            chunk = await asyncio.to_thread(encoder.encode, rows)
+            rows_exported += len(rows)
+            if chunk:
+                yield chunk
+    chunk = await asyncio.to_thread(encoder.finish)
+    if chunk:
+        yield chunk
+    logging.info(f"Exported {rows_exported} rows as {export_format}")
@@ -0,0 +1,235 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, List, Optional
+from sqlalchemy import inspect, insert, select
+from sqlalchemy.exc import DataError, IntegrityError, StatementError
+from sqlalchemy.orm import Session
+from ..config.db_config import SessionLocal, settings
+from ..models.user_models import User
+from ..models.waste_models import WasteRecord, upsert_daily_stats
+from .catalog_service import waste_catalog
+from .metrics_service import metrics
+
+logging.basicConfig(level=logging.INFO)
+
+history_rows_total = metrics.counter(
+    "sustainaware_classification_history_rows_total",
+    "Classification results handed to the history writer, by outcome (written, dropped or failed).",
+    ("outcome",),
+)
+
+
+# Columns of waste_records the writer inserts
+HISTORY_COLUMNS = (
+    "id", "waste_name", "waste_category", "estimated_weight", "created_at",
+    "waste_type_id", "user_id", "confidence", "item_count", "model_version",
+)
+
+
+def _is_row_error(error: Exception) -> bool:
+    """Whether the database (or a bind parameter) rejected rows, rather than being unreachable."""
+    return isinstance(error, (IntegrityError, DataError)) or type(error) is StatementError
+
+
+class ClassificationHistoryWriter:
+    """
+    Write-behind queue turning classification results into waste records.
+
+    `record` only appends to a bounded queue, so the request path never waits
+    on the database; when the queue is full the result is dropped and counted.
+    A background worker collects up to `max_batch_size` rows, or whatever
+    arrived within `max_wait_ms`, and writes them with one multi-row insert,
+    updating the daily statistics rollup in the same transaction. A failed
+    write is retried once and then split up, so rows the database rejects only
+    lose themselves.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_batch_size: int = 500,
+        max_wait_ms: float = 1000,
+        max_queue_size: int = 10000,
+        enabled: bool = True,
+        name: str = "classification-history",
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.enabled = enabled
+        self.name = name
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._closed = False
+
+    def check_schema(self) -> bool:
+        """
+        Disable the writer when waste_records lacks the history columns, so an
+        unmigrated database fails loudly at startup instead of on every batch.
+        """
+        if not self.enabled:
+            return False
+        try:
+            with self.session_factory() as db:
+                columns = {column["name"] for column in inspect(db.connection()).get_columns(WasteRecord.__tablename__)}
+        except Exception as e:
+            logging.error(f"{self.name} could not inspect {WasteRecord.__tablename__}; disabling it: {e}")
+            self.enabled = False
+            return False
+        missing = [column for column in HISTORY_COLUMNS if column not in columns]
+        if missing:
+            logging.error(
+                f"{self.name} is disabled: {WasteRecord.__tablename__} has no {', '.join(missing)} column(s). "
+                "Run `python -m backend.core.migrate_classification_history` and restart."
+            )
+            self.enabled = False
+        return self.enabled
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+                self._worker.start()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def record(self, detected_items: list, model_version: str, user_id: Optional[uuid.UUID] = None):
+        """Queue the items of one classification for persistence without blocking."""
+        if not self.enabled or self._closed or not detected_items:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((datetime.utcnow(), user_id, model_version, detected_items))
+        except queue.Full:
+            history_rows_total.inc("dropped", amount=len(detected_items))
+            logging.warning(f"{self.name} queue is full; dropped {len(detected_items)} classification results")
+
+    def _collect(self, first: tuple) -> List[tuple]:
+        batch, rows = [first], len(first[3])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Shutdown sentinel: put it back so the main loop sees it after this batch
+                self._queue.put(None)
+                break
+            batch.append(entry)
+            rows += len(entry[3])
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            self._write(self._collect(first))
+
+    def _write(self, batch: List[tuple]):
+        try:
+            rows = self._prepare_rows(batch)
+        except Exception as e:
+            row_count = sum(len(entry[3]) for entry in batch)
+            history_rows_total.inc("failed", amount=row_count)
+            logging.error(f"{self.name} could not prepare {row_count} classification results: {e}")
+            return
+        self._insert_rows(rows, retry=True)
+
+    def _prepare_rows(self, batch: List[tuple]) -> List[dict]:
+        with self.session_factory() as db:
+            catalog = waste_catalog.get_snapshot(db)
+            # Tokens are only decoded on the request path; drop ids of users deleted since
+            user_ids = {entry[1] for entry in batch if entry[1] is not None}
+            if user_ids:
+                user_ids = set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+
+        rows = []
+        for created_at, user_id, model_version, items in batch:
+            for item in items:
+                entry = catalog.lookup(item["waste_name"])
+                rows.append({
+                    "id": uuid.uuid4(),
+                    "waste_name": item["waste_name"][:255],
+                    "waste_category": item["category"][:50],
+                    "estimated_weight": item.get("total_estimated_weight") or 0.0,
+                    "created_at": created_at,
+                    "waste_type_id": entry.waste_type_id if entry else None,
+                    "user_id": user_id if user_id in user_ids else None,
+                    "confidence": item.get("confidence"),
+                    "item_count": item.get("item_count", 1),
+                    "model_version": model_version,
+                })
+        return rows
+
+    def _insert(self, rows: List[dict]):
+        deltas = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            delta = deltas[(row["created_at"].date(), row["waste_category"])]
+            delta[0] += 1
+            delta[1] += row["estimated_weight"]
+        with self.session_factory() as db:
+            # Bulk inserts skip the flush hooks, so the rollup is updated explicitly
+            db.execute(insert(WasteRecord), rows)
+            upsert_daily_stats(db.connection(), deltas)
+            db.commit()
+
+    def _insert_rows(self, rows: List[dict], retry: bool = False):
+        """
+        Insert rows in one transaction, retrying once with a fresh session.
+
+        When the rows themselves are rejected (constraint or data errors), the
+        batch is split in halves until the bad rows are isolated, so one bad
+        item does not discard the rest of the batch.
+        """
+        try:
+            self._insert(rows)
+        except Exception as e:
+            if retry:
+                logging.warning(f"{self.name} could not write {len(rows)} classification results, retrying: {e}")
+                return self._insert_rows(rows)
+            if len(rows) > 1 and _is_row_error(e):
+                middle = len(rows) // 2
+                self._insert_rows(rows[:middle])
+                self._insert_rows(rows[middle:])
+                return
+            history_rows_total.inc("failed", amount=len(rows))
+            logging.error(f"{self.name} could not write {len(rows)} classification results: {e}")
+            return
+        history_rows_total.inc("written", amount=len(rows))
+
+    def close(self, timeout: Optional[float] = 30):
+        """Stop accepting results and write out everything already queued."""
+        self._closed = True
+        if self._worker is None:
+            return
+        self._queue.put(None)
+        self._worker.join(timeout=timeout)
+
+
+# Shared writer fed by classify_waste
+classification_history = ClassificationHistoryWriter(
+    max_batch_size=settings.HISTORY_BATCH_SIZE,
+    max_wait_ms=settings.HISTORY_FLUSH_MS,
+    max_queue_size=settings.HISTORY_QUEUE_SIZE,
+    enabled=settings.CLASSIFICATION_HISTORY_ENABLED,
+)
+
+metrics.gauge_callback(
+    "sustainaware_classification_history_queue_depth",
+    "Classifications waiting to be written to waste_records.",
+    lambda: classification_history.pending,
+)
@@ -0,0 +1,88 @@
+import io
+import logging
+from typing import Tuple
+import numpy as np
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+logging.basicConfig(level=logging.INFO)
+
+LETTERBOX_FILL = (114, 114, 114)  # Same padding colour YOLO uses during training
+SUPPORTED_IMAGE_FORMATS = ["jpeg", "png", "gif", "bmp", "tiff"]
+
+
+def open_image(image_bytes: bytes, target_size: int, max_pixels: int) -> Image.Image:
+    """
+    Decode an uploaded image as RGB at (roughly) the scale we actually need.
+
+    The pixel count is checked from the header before anything is decoded, JPEGs
+    are decoded with the DCT scaling of `draft()` so a 12 MP photo is never fully
+    materialized, and EXIF orientation is applied so phone photos are upright.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+    except Exception as e:
+        logging.error(f"Invalid image format: {e}")
+        raise HTTPException(status_code=400, detail="Invalid image format.")
+
+    width, height = img.size
+    if width * height > max_pixels:
+        logging.error(f"Image too large: {width}x{height} exceeds {max_pixels} pixels")
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image is too large ({width}x{height}). Maximum is {max_pixels} pixels."
+        )
+
+    try:
+        # Only has an effect for JPEG; picks the smallest scale that still covers target_size
+        img.draft("RGB", (target_size, target_size))
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return img
+    except Exception as e:
+        logging.error(f"Invalid image format: {e}")
+        raise HTTPException(status_code=400, detail="Invalid image format.")
+
+
+def letterbox(img: Image.Image, size: int) -> np.ndarray:
+    """
+    Fit the image inside a `size` x `size` square without distorting its aspect ratio.
+
+    The resized image is pasted onto a padded canvas and the canvas buffer is
+    exported once as a contiguous HxWx3 uint8 array.
+    """
+    left, top, right, bottom = letterbox_content_box(*img.size, size)
+    new_width, new_height = right - left, bottom - top
+
+    if (new_width, new_height) != img.size:
+        img = img.resize((new_width, new_height), Image.BILINEAR, reducing_gap=2.0)
+
+    canvas = Image.new("RGB", (size, size), LETTERBOX_FILL)
+    canvas.paste(img, (left, top))
+    return np.asarray(canvas)
+
+
+def letterbox_content_box(width: int, height: int, size: int) -> Tuple[int, int, int, int]:
+    """(left, top, right, bottom) of a `width` x `height` image inside its letterboxed canvas, padding excluded."""
+    scale = min(size / width, size / height)
+    new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+    left, top = (size - new_width) // 2, (size - new_height) // 2
+    return left, top, left + new_width, top + new_height
+
+
+def preprocess_image(image_bytes: bytes, size: int = 512, max_pixels: int = 40_000_000) -> np.ndarray:
+    """Decode, orient and letterbox an uploaded image for the detector."""
+    return preprocess_image_with_box(image_bytes, size, max_pixels)[0]
+
+
+def preprocess_image_with_box(
+    image_bytes: bytes, size: int = 512, max_pixels: int = 40_000_000
+) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+    """Like `preprocess_image`, also returning the image's content box inside the canvas."""
+    img = open_image(image_bytes, size, max_pixels)
+    try:
+        return letterbox(img, size), letterbox_content_box(*img.size, size)
+    except Exception as e:
+        logging.error(f"Invalid image format: {e}")
+        raise HTTPException(status_code=400, detail="Invalid image format.")
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import shutil
+from typing import Iterator, List, Optional
+import numpy as np
+from .image_preprocessing import preprocess_image
+
+logging.basicConfig(level=logging.INFO)
+
+SUPPORTED_BACKENDS = ("torch", "onnxruntime", "openvino")
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Ultralytics export format for each backend
+EXPORT_FORMATS = {
+    "onnxruntime": "onnx",
+    "openvino": "openvino",
+}
+
+
+def weights_fingerprint(weights_path: str) -> str:
+    """Short hash of the weights file identity (path, size and mtime)."""
+    stat = os.stat(weights_path)
+    identity = f"{os.path.abspath(weights_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha1(identity.encode()).hexdigest()[:12]
+
+
+def load_calibration_batches(calibration_dir: str, imgsz: int, limit: int) -> List[np.ndarray]:
+    """
+    Load calibration images as NCHW float32 tensors, preprocessed like live traffic.
+    """
+    if not calibration_dir or not os.path.isdir(calibration_dir):
+        raise ValueError("INT8 quantization requires MODEL_CALIBRATION_DIR to point at a directory of images.")
+
+    batches = []
+    for file_name in sorted(os.listdir(calibration_dir)):
+        if not file_name.lower().endswith(CALIBRATION_EXTENSIONS):
+            continue
+        with open(os.path.join(calibration_dir, file_name), "rb") as f:
+            img_array = preprocess_image(f.read(), size=imgsz)
+        tensor = np.ascontiguousarray(img_array.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+        batches.append(tensor)
+        if len(batches) >= limit:
+            break
+
+    if not batches:
+        raise ValueError(f"No calibration images found in {calibration_dir}.")
+    logging.info(f"Loaded {len(batches)} calibration images from {calibration_dir}")
+    return batches
+
+
+def _quantize_onnx(fp32_path: str, int8_path: str, calibration: List[np.ndarray]):
+    """Static INT8 quantization of an ONNX model with onnxruntime."""
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    source = onnx.load(fp32_path)
+    input_name = source.graph.input[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self, tensors):
+            self._tensors: Iterator[np.ndarray] = iter(tensors)
+
+        def get_next(self):
+            tensor = next(self._tensors, None)
+            return None if tensor is None else {input_name: tensor}
+
+    quantize_static(
+        fp32_path,
+        int8_path,
+        _Reader(calibration),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+    # Keep the class names and image size Ultralytics stores in the model metadata
+    quantized = onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, int8_path)
+
+
+def _quantize_openvino(fp32_dir: str, int8_dir: str, calibration: List[np.ndarray]):
+    """Post-training INT8 quantization of an OpenVINO model with NNCF."""
+    import nncf
+    import openvino as ov
+
+    xml_name = next(name for name in os.listdir(fp32_dir) if name.endswith(".xml"))
+    shutil.copytree(fp32_dir, int8_dir)
+
+    core = ov.Core()
+    model = core.read_model(os.path.join(fp32_dir, xml_name))
+    quantized = nncf.quantize(model, nncf.Dataset(calibration), subset_size=len(calibration))
+    ov.save_model(quantized, os.path.join(int8_dir, xml_name))
+
+
+def export_model(
+    weights_path: str,
+    backend: str,
+    export_dir: str,
+    imgsz: int = 640,
+    int8: bool = False,
+    calibration_dir: Optional[str] = None,
+    calibration_size: int = 200,
+) -> str:
+    """
+    Export the PyTorch weights for `backend` and return the path to load.
+
+    Exports are cached in `export_dir` under a name derived from the weights
+    fingerprint, image size and precision, so they are only rebuilt when the
+    weights change.
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported inference backend '{backend}'. Choose from {SUPPORTED_BACKENDS}.")
+    if backend == "torch":
+        return weights_path
+
+    from ultralytics import YOLO
+
+    export_format = EXPORT_FORMATS[backend]
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    base_name = f"{stem}-{weights_fingerprint(weights_path)}-{imgsz}"
+    suffix = ".onnx" if export_format == "onnx" else "_openvino_model"
+    fp32_path = os.path.join(export_dir, base_name + suffix)
+    target_path = os.path.join(export_dir, base_name + "-int8" + suffix) if int8 else fp32_path
+
+    if os.path.exists(target_path):
+        logging.info(f"Using cached {backend} export: {target_path}")
+        return target_path
+
+    os.makedirs(export_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        logging.info(f"Exporting {weights_path} to {export_format} (imgsz={imgsz})...")
+        exported = YOLO(weights_path).export(format=export_format, imgsz=imgsz, dynamic=True)
+        shutil.move(str(exported), fp32_path)
+
+    if int8:
+        logging.info(f"Quantizing {fp32_path} to INT8...")
+        calibration = load_calibration_batches(calibration_dir, imgsz, calibration_size)
+        if backend == "onnxruntime":
+            _quantize_onnx(fp32_path, target_path, calibration)
+        else:
+            _quantize_openvino(fp32_path, target_path, calibration)
+
+    logging.info(f"{backend} model ready at {target_path}")
+    return target_path
@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+from ..config.db_config import settings
+from .metrics_service import metrics
+
+logging.basicConfig(level=logging.INFO)
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference executor cannot accept more work."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a bounded backlog for blocking inference work.
+
+    At most `max_workers` jobs run at once and at most `max_queue_size` more may
+    wait for a worker. Anything beyond that is rejected immediately with
+    `ExecutorSaturatedError` instead of piling up behind the model.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int, retry_after: int = 1, name: str = "inference"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.retry_after = retry_after
+        self.name = name
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue_size)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting for a worker."""
+        return self._pending
+
+    def _release(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule `fn` on the pool, or raise if the backlog is full."""
+        if self._closed:
+            raise ExecutorSaturatedError(f"{self.name} executor is shutting down.", self.retry_after)
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturatedError(f"{self.name} executor queue is full.", self.retry_after)
+
+        with self._lock:
+            self._pending += 1
+        try:
+            # Carry context variables (e.g. request timings) over to the worker, like asyncio.to_thread
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn` on the pool and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """Reject new work and, if `wait` is set, let queued jobs finish."""
+        self._closed = True
+        logging.info(f"Shutting down {self.name} executor with {self._pending} pending job(s).")
+        self._executor.shutdown(wait=wait)
+
+
+# Shared executor for image classification
+inference_executor = BoundedExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+    retry_after=settings.INFERENCE_RETRY_AFTER,
+    name="inference",
+)
+
+metrics.gauge_callback(
+    "sustainaware_inference_queue_depth",
+    "Inference jobs running or waiting in the bounded executor.",
+    lambda: inference_executor.pending,
+)
@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+from ..config.db_config import settings
+
+logging.basicConfig(level=logging.INFO)
+
+
+class ModelState(str, Enum):
+    PENDING = "pending"
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ManagedModel:
+    """
+    A model with its loader, optional warm-up routine and lifecycle state.
+
+    After a failed load, further attempts wait `retry_backoff` seconds,
+    doubling with every failure up to `max_retry_backoff`; until then callers
+    get the previous error straight away instead of a slow reload.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+        retry_backoff: float = 5.0,
+        max_retry_backoff: float = 300.0,
+    ):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+
+        self.state = ModelState.PENDING
+        self.instance: Any = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> Any:
+        """Load and warm up the model once; concurrent callers wait for the first load."""
+        with self._lock:
+            if self.state == ModelState.READY:
+                return self.instance
+            if self.state == ModelState.FAILED and time.monotonic() < self._retry_at:
+                raise RuntimeError(
+                    f"Model '{self.name}' failed to load ({self.error}); "
+                    f"retrying in {self._retry_at - time.monotonic():.0f}s."
+                )
+
+            self.state = ModelState.LOADING
+            self.error = None
+            try:
+                start_time = time.perf_counter()
+                instance = self.loader()
+                self.load_seconds = time.perf_counter() - start_time
+
+                self.state = ModelState.WARMING
+                if self.warmup:
+                    start_time = time.perf_counter()
+                    self.warmup(instance)
+                    self.warmup_seconds = time.perf_counter() - start_time
+
+                self.instance = instance
+                self.state = ModelState.READY
+                self.failures = 0
+                logging.info(
+                    f"Model '{self.name}' ready (load {self.load_seconds:.2f}s, "
+                    f"warm-up {self.warmup_seconds or 0:.2f}s)."
+                )
+                return instance
+            except Exception as e:
+                self.state = ModelState.FAILED
+                self.error = str(e)
+                backoff = min(self.max_retry_backoff, self.retry_backoff * 2 ** self.failures)
+                self.failures += 1
+                self._retry_at = time.monotonic() + backoff
+                logging.error(f"Error loading model '{self.name}' (next attempt in {backoff:.0f}s): {e}")
+                raise
+
+    def get(self) -> Any:
+        """Return the loaded model, loading it on first use."""
+        if self.state == ModelState.READY:
+            return self.instance
+        return self.load()
+
+    def status(self) -> dict:
+        return {
+            "state": self.state.value,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "failures": self.failures,
+        }
+
+
+class ModelRegistry:
+    """
+    Central place where services register their models.
+
+    Nothing is loaded at import time. The app lifespan calls `load_all()` to load
+    every model in parallel; anything requested earlier is loaded lazily.
+    """
+
+    def __init__(self, retry_backoff: float = 5.0, max_retry_backoff: float = 300.0):
+        self._models: Dict[str, ManagedModel] = {}
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+
+    def register(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]] = None) -> ManagedModel:
+        managed = ManagedModel(name, loader, warmup, self.retry_backoff, self.max_retry_backoff)
+        self._models[name] = managed
+        return managed
+
+    def get(self, name: str) -> Any:
+        if name not in self._models:
+            raise KeyError(f"Model '{name}' is not registered.")
+        return self._models[name].get()
+
+    def load_all(self, parallel: bool = True):
+        """Load every registered model, logging (not raising) individual failures."""
+        def _load(managed: ManagedModel):
+            try:
+                managed.load()
+            except Exception:
+                pass
+
+        models = list(self._models.values())
+        if parallel and len(models) > 1:
+            with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="model-loader") as pool:
+                list(pool.map(_load, models))
+        else:
+            for managed in models:
+                _load(managed)
+
+    def is_ready(self) -> bool:
+        return all(managed.state == ModelState.READY for managed in self._models.values())
+
+    def status(self) -> dict:
+        return {name: managed.status() for name, managed in self._models.items()}
+
+
+# Shared registry for all models served by the API
+model_registry = ModelRegistry(settings.MODEL_RETRY_BACKOFF_SECONDS, settings.MODEL_RETRY_BACKOFF_MAX_SECONDS)
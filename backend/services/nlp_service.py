@@ -1,15 +1,131 @@
+import collections
 import json
+import logging
 import os
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
-import torch
+from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
+from ..config.db_config import settings
 from ..schemas.nlp_schemas import NLPResponse, NLPErrorResponse  
+from .ann_index import IVFIndex
+from .embedding_index import EmbeddingIndex
+from .model_registry import model_registry
+from .metrics_service import metrics, nlp_responses_total
+from .result_cache import ResultCache, SingleFlight
+from .semantic_cache import SemanticCache
+from .timing_service import stage
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+NO_MATCH_RESPONSE = "Sorry, I don't have information about that yet."
+ERROR_RESPONSE = "Failed to process the input text."
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def chunk_passages(context: dict, max_words: int) -> list:
+    """
+    Split every article into (topic, passage) pairs of whole sentences, at most
+    `max_words` words each unless a single sentence is longer.
+    """
+    passages = []
+    for topic, article in context.items():
+        chunk, words = [], 0
+        for sentence in _SENTENCE_END.split(article.strip()):
+            sentence_words = len(sentence.split())
+            if chunk and words + sentence_words > max_words:
+                passages.append((topic, " ".join(chunk)))
+                chunk, words = [], 0
+            chunk.append(sentence)
+            words += sentence_words
+        if chunk:
+            passages.append((topic, " ".join(chunk)))
+    return passages
+
+def normalize_query(text: str) -> str:
+    """Cache key of a question: case, spacing and trailing punctuation do not change the answer."""
+    return " ".join(text.casefold().split()).rstrip("?!. ")
+
+def cap_words(text: str, max_length) -> str:
+    """Trim an answer to at most `max_length` words."""
+    words = text.split()
+    if not max_length or len(words) <= max_length:
+        return text.strip()
+    return " ".join(words[:max_length]).rstrip(",;:") + "..."
+
+# Repeated questions skip the embedder, and the QA model too when the answer is cached
+query_embedding_cache = ResultCache(
+    max_entries=settings.NLP_EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.NLP_EMBEDDING_CACHE_TTL_SECONDS,
+    max_bytes=settings.NLP_CACHE_MAX_BYTES,
+)
+answer_cache = ResultCache(
+    max_entries=settings.NLP_ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.NLP_ANSWER_CACHE_TTL_SECONDS,
+    max_bytes=settings.NLP_CACHE_MAX_BYTES,
+)
+# Paraphrases of a recent question reuse its answer
+semantic_cache = SemanticCache(
+    max_entries=settings.NLP_SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.NLP_SEMANTIC_CACHE_TTL_SECONDS,
+    threshold=settings.NLP_SEMANTIC_CACHE_THRESHOLD,
+)
+answer_flights = SingleFlight()
+NLP_CACHES = {"embedding": query_embedding_cache, "answer": answer_cache, "semantic": semantic_cache}
+
+# Sampled semantic hits are re-answered by the models one at a time, off the request path
+_audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp-semantic-audit")
+_audit_slot = threading.Semaphore(1)
+recent_semantic_disagreements = collections.deque(maxlen=20)
+
+
+def shutdown_semantic_audits(wait: bool = True):
+    """Stop the audit worker at shutdown; an audit already running finishes first when `wait` is set."""
+    _audit_executor.shutdown(wait=wait, cancel_futures=True)
+
+metrics.counter_callback(
+    "sustainaware_nlp_cache_lookups_total",
+    "NLP cache lookups since startup, by cache and outcome.",
+    lambda: {key: value for name, cache in NLP_CACHES.items()
+             for key, value in (((name, "hit"), cache.hits), ((name, "miss"), cache.misses))},
+    ("cache", "outcome"),
+)
+metrics.gauge_callback(
+    "sustainaware_nlp_cache_entries",
+    "Entries currently held in each NLP cache.",
+    lambda: {(name,): cache.stats()["entries"] for name, cache in NLP_CACHES.items()},
+    ("cache",),
+)
+metrics.counter_callback(
+    "sustainaware_nlp_coalesced_requests_total",
+    "NLP questions answered by waiting for an identical question already in flight.",
+    lambda: answer_flights.coalesced,
+)
+semantic_cache_similarity = metrics.histogram(
+    "sustainaware_nlp_semantic_cache_similarity",
+    "Similarity of the closest cached question per semantic cache lookup, hit or miss.",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0),
+)
+semantic_cache_audits_total = metrics.counter(
+    "sustainaware_nlp_semantic_cache_audits_total",
+    "Sampled semantic cache hits re-answered by the models, by outcome (agree, disagree, error or skipped).",
+    ("outcome",),
+)
 
 class NLPModel:
-    def __init__(self, context_path='data/context.json', cache_dir='models/weights/nlp'):
+    def __init__(self, context_path='data/context.json', cache_dir='models/weights/nlp',
+                 index_dir=settings.NLP_INDEX_DIR, index_dtype=settings.NLP_INDEX_DTYPE,
+                 passage_words=settings.NLP_PASSAGE_WORDS, ann_min_entries=settings.NLP_ANN_MIN_ENTRIES):
         """
         Initialize the NLP model with QA and sentence embedding models.
+
+        The knowledge base is split into passages whose embeddings come from a
+        memory-mapped index on disk, recomputed only when the passages or the
+        embedding model change. Knowledge bases of at least `ann_min_entries`
+        passages are searched through an IVF index instead of scanning every
+        embedding.
         """
         load_dotenv()
         try:
@@ -19,12 +135,27 @@ class NLPModel:
                                      model="distilbert-base-uncased-distilled-squad", 
                                      model_kwargs={"cache_dir": cache_dir}) 
 
-            self.embedder = SentenceTransformer('all-MiniLM-L6-v2', cache_folder=cache_dir)  
+            self.embedder = SentenceTransformer(EMBEDDING_MODEL, cache_folder=cache_dir)  
             self.context = self.load_context(context_path)
-            self.topics = list(self.context.keys())
-            self.topic_embeddings = self.embedder.encode(self.topics, convert_to_tensor=True)
+            self.passage_words = passage_words
+            self.passages = chunk_passages(self.context, passage_words)
+            self._passages_lock = threading.RLock()
+            # The topic title is embedded with its passage so short questions still find it
+            self.passage_index = EmbeddingIndex.load_or_build(
+                index_dir, "passages", [f"{topic}: {text}" for topic, text in self.passages],
+                self.encode, EMBEDDING_MODEL, index_dtype
+            )
+            # A single list is an exact scan, which is also the fastest search for small knowledge bases
+            n_lists = (settings.NLP_ANN_LISTS or None) if len(self.passages) >= ann_min_entries else 1
+            self.passage_search = IVFIndex.load_or_build(
+                index_dir, "passages", self.passage_index, n_lists, settings.NLP_ANN_NPROBE
+            )
+            # Part of every answer cache key, so answers never outlive the knowledge they came from
+            self.knowledge_version = self.passage_index.manifest["content_hash"][:16]
+            self._knowledge_edits = 0
         except Exception as e:
             print(f"Error initializing models: {e}")
+            raise
 
     def load_context(self, context_path):
         """
@@ -37,42 +168,204 @@ class NLPModel:
             print(f"Error: {context_path} not found.")
             return {}
 
-    def get_cosine_similarity(self, query):
+    def encode(self, texts):
+        """Embed texts as unit-length float32 vectors."""
+        return self.embedder.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+    def embed_query(self, query):
         """
-        Find the most similar response using cosine similarity.
+        Embed a question, reusing the embedding of an earlier question with the
+        same normalized text. The question is encoded as asked; the normalized
+        text is only the cache key.
         """
-        try:
-            query_embedding = self.embedder.encode(query, convert_to_tensor=True)
-            similarities = util.cos_sim(query_embedding, self.topic_embeddings)
-            best_match_idx = torch.argmax(similarities).item()
-            best_topic = self.topics[best_match_idx]
-            return self.context.get(best_topic, None)
-        except Exception as e:
-            print(f"Error calculating cosine similarity: {e}")
+        key = normalize_query(query)
+        embedding = query_embedding_cache.get(key) if settings.NLP_CACHE_ENABLED else None
+        if embedding is None:
+            embedding = self.encode(query)
+            if settings.NLP_CACHE_ENABLED:
+                embedding.flags.writeable = False  # Shared by every request asking the same question
+                query_embedding_cache.put(key, embedding)
+        return embedding
+
+    def retrieve_passages(self, query, k=settings.NLP_TOP_K, min_similarity=settings.NLP_MIN_SIMILARITY):
+        """
+        Return up to `k` (passage, similarity) pairs for the query, best first,
+        leaving out passages less similar than `min_similarity`.
+        """
+        with stage("embed"):
+            query_embedding = self.embed_query(query)
+        with stage("retrieval"):
+            matches = self.passage_search.search(query_embedding, k)
+        return [(self.passages[row][1], score) for row, score in matches if score >= min_similarity]
+
+    def add_article(self, topic, article):
+        """
+        Add an article to the knowledge base of this process, replacing any
+        previous article with the same topic, without rebuilding the index.
+
+        The change is not written to disk; edit the context file to keep it.
+        """
+        new_passages = chunk_passages({topic: article}, self.passage_words)
+        embeddings = self.encode([f"{topic}: {text}" for _, text in new_passages])
+        with self._passages_lock:
+            self.remove_article(topic)
+            first_id = len(self.passages)
+            # Ids are positions in self.passages, so removed passages stay in the list
+            self.passages.extend(new_passages)
+            self.passage_search.add(range(first_id, len(self.passages)), embeddings)
+            self.context[topic] = article
+            self._knowledge_changed()
+        return len(new_passages)
+
+    def remove_article(self, topic):
+        """Remove an article from the knowledge base of this process; returns whether it existed."""
+        with self._passages_lock:
+            if topic not in self.context:
+                return False
+            self.passage_search.remove(row for row, (passage_topic, _) in enumerate(self.passages)
+                                       if passage_topic == topic)
+            del self.context[topic]
+            self._knowledge_changed()
+        return True
+
+    def _knowledge_changed(self):
+        """Start a new knowledge-base version and drop the answers cached for older ones."""
+        self._knowledge_edits += 1
+        self.knowledge_version = f"{self.passage_index.manifest['content_hash'][:16]}.{self._knowledge_edits}"
+        answer_cache.clear()
+        semantic_cache.clear()
+
+    def get_qa_response(self, query, passages, max_length=None):
+        """
+        Extract an answer from the retrieved passages with the QA model.
+
+        All passages go through the pipeline in one batched call and the
+        highest-scoring span wins. Returns (answer, score), or None when the
+        model is not confident in any span.
+        """
+        with stage("qa"):
+            results = self.qa_model(
+                question=[query] * len(passages),
+                context=passages,
+                max_answer_len=max_length or 15,
+            )
+        if isinstance(results, dict):  # The pipeline unwraps single-item batches
+            results = [results]
+        best = max(results, key=lambda result: result["score"])
+        if best["score"] < settings.NLP_QA_MIN_SCORE or not best["answer"].strip():
             return None
+        return best["answer"], best["score"]
 
-    def get_qa_response(self, query):
+    def get_response(self, user_input, max_length=None):
         """
-        Get a response using a question-answering model.
+        Answer a question from the knowledge base in at most `max_length` words.
+
+        The top passages above the similarity threshold are handed to the QA
+        model; when it finds no confident answer the best passage is returned
+        instead, and questions unrelated to the knowledge base get a fixed reply.
+
+        Answers are cached per normalized question, length and knowledge-base
+        version, and concurrent identical questions share one computation. A
+        question whose embedding is close enough to a recently answered one
+        gets that answer without retrieval or QA.
         """
-        try:
-            response = self.qa_model(question=query, context=" ".join(self.topics))
-            return response['answer']
-        except Exception as e:
-            print(f"Error generating QA response: {e}")
-            return "Sorry, I couldn't process your query."
+        if not settings.NLP_CACHE_ENABLED:
+            return self._respond(user_input, max_length)
 
-    def get_response(self, user_input):
+        namespace = f"{self.knowledge_version}|{max_length}"
+        key = f"{namespace}|{normalize_query(user_input)}"
+        answer = answer_cache.get(key)
+        if answer is not None:
+            nlp_responses_total.inc("cache")
+            return answer
+        return answer_flights.do(key, lambda: self._respond(user_input, max_length, namespace))
+
+    def _respond(self, user_input, max_length=None, namespace=None):
+        """
+        Answer from the semantic cache or the models. With a cache `namespace`,
+        answers from the models are cached unless they failed.
+        """
+        use_semantic_cache = namespace is not None and settings.NLP_SEMANTIC_CACHE_ENABLED
         try:
-            similar_response = self.get_cosine_similarity(user_input)
-            if similar_response:
-                return similar_response 
+            if use_semantic_cache:
+                with stage("embed"):
+                    query_embedding = self.embed_query(user_input)
+                answer = self._semantic_lookup(user_input, query_embedding, namespace, max_length)
+                if answer is not None:
+                    nlp_responses_total.inc("semantic_cache")
+                    return answer
+            answer, source = self._answer_from_models(user_input, max_length)
 
-            qa_response = self.get_qa_response(user_input)
-            return qa_response 
-        
         except Exception as e:
+            nlp_responses_total.inc("error")
             print(f"Error processing response: {e}")
-            return "Failed to process the input text." 
+            return ERROR_RESPONSE
+
+        nlp_responses_total.inc(source)
+        if namespace is not None:
+            query = normalize_query(user_input)
+            answer_cache.put(f"{namespace}|{query}", answer)
+            if use_semantic_cache:
+                semantic_cache.put(query_embedding, namespace, query, answer)
+        return answer
+
+    def _answer_from_models(self, user_input, max_length=None):
+        """Retrieve passages and run QA; returns (answer, source)."""
+        matches = self.retrieve_passages(user_input)
+        if not matches:
+            return NO_MATCH_RESPONSE, "no_match"
+        qa_answer = self.get_qa_response(user_input, [passage for passage, _ in matches], max_length)
+        if qa_answer is not None:
+            return cap_words(qa_answer[0], max_length), "qa"
+        return cap_words(matches[0][0], max_length), "retrieval"
+
+    def _semantic_lookup(self, user_input, query_embedding, namespace, max_length):
+        """Return the cached answer of a similar recent question, sampling some hits for an audit."""
+        similarity, cached_query, answer = semantic_cache.lookup(query_embedding, namespace)
+        if similarity > float("-inf"):
+            semantic_cache_similarity.observe(similarity)
+        if answer is not None and random.random() < settings.NLP_SEMANTIC_CACHE_AUDIT_RATE:
+            if _audit_slot.acquire(blocking=False):
+                try:
+                    _audit_executor.submit(self._audit_semantic_hit, user_input, max_length, cached_query, answer, similarity)
+                except RuntimeError:  # Audits shut down
+                    _audit_slot.release()
+            else:
+                semantic_cache_audits_total.inc("skipped")
+        return answer
+
+    def _audit_semantic_hit(self, user_input, max_length, cached_query, cached_answer, similarity):
+        """Re-answer a semantic cache hit with the models and record whether the answers agree."""
+        try:
+            fresh_answer, _ = self._answer_from_models(user_input, max_length)
+        except Exception as e:
+            semantic_cache_audits_total.inc("error")
+            logging.warning(f"Semantic cache audit failed: {e}")
+            return
+        finally:
+            _audit_slot.release()
+
+        if fresh_answer == cached_answer:
+            semantic_cache_audits_total.inc("agree")
+            return
+        # Not every disagreement is wrong (QA may pick another span of the same passage), so keep them for review
+        semantic_cache_audits_total.inc("disagree")
+        recent_semantic_disagreements.append({
+            "query": user_input,
+            "cached_query": cached_query,
+            "similarity": round(similarity, 4),
+            "cached_answer": cached_answer,
+            "fresh_answer": fresh_answer,
+        })
+        logging.warning(f"Semantic cache answered {user_input!r} with the answer to {cached_query!r} "
+                        f"(similarity {similarity:.3f}), but the models now answer differently")
 
+def warmup_nlp_model(nlp_model: NLPModel):
+    """Exercise the embedder and QA pipeline once before serving traffic."""
+    query = "How do I recycle plastic bottles?"
+    passages = [passage for passage, _ in nlp_model.retrieve_passages(query, min_similarity=-1.0)]
+    if passages:
+        nlp_model.get_qa_response(query, passages)
 
+# The NLP model is loaded by the app lifespan (or lazily on first use)
+model_registry.register("nlp", NLPModel, warmup=warmup_nlp_model)
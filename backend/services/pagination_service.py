@@ -0,0 +1,68 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from uuid import UUID
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import Select, tuple_
+
+logging.basicConfig(level=logging.INFO)
+
+
+def encode_cursor(sort_value: datetime, row_id: Any) -> str:
+    """Pack the sort key of the last row on a page into an opaque, URL-safe token."""
+    raw = json.dumps([sort_value.isoformat(), str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Unpack a token from `encode_cursor`; malformed tokens are a 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+
+def keyset_page(stmt: Select, sort_column, id_column, cursor: Optional[str], limit: int) -> Select:
+    """
+    Restrict a query to one page, newest first.
+
+    Rows are ordered by (sort_column, id_column) descending and the page
+    starts strictly after the cursor's row, so every page is a backward range
+    scan of the plain (sort_column, id_column) indexes no matter how deep it
+    is. Rows without a sort value are left out: NULL sorts first in such a
+    scan on PostgreSQL but last on SQLite, and has no place in a cursor. One
+    extra row is fetched to tell whether another page follows.
+    """
+    stmt = stmt.where(sort_column.isnot(None))
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(sort_column, id_column) < tuple_(sort_value, row_id))
+    return stmt.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, sort_key: str, id_key: str = "id") -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build the cursor of the next page, if there is one."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_key), getattr(last, id_key))
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]):
+    """
+    Advertise the next page in response headers.
+
+    The body stays a plain JSON list, so existing clients keep working and
+    simply see the first page.
+    """
+    if next_cursor is None:
+        return
+    response.headers["X-Next-Cursor"] = next_cursor
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
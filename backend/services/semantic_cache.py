@@ -0,0 +1,86 @@
+import threading
+import time
+from typing import Any, Optional, Tuple
+import numpy as np
+from .embedding_index import normalize_rows
+
+
+class SemanticCache:
+    """
+    Answers of recently answered questions, looked up by embedding similarity.
+
+    Entries live in a fixed-size ring, so the oldest answer is replaced first,
+    and a lookup is a single matrix-vector product over the ring. A lookup hits
+    when an unexpired entry in the same namespace (e.g. knowledge-base version
+    and answer length) has a cosine similarity of at least `threshold`.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600, threshold: float = 0.9):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+
+        self._vectors: Optional[np.ndarray] = None  # Allocated on the first put, once the dimension is known
+        self._namespaces = np.full(self.max_entries, None, dtype=object)
+        self._queries = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self._expires_at = np.full(self.max_entries, -np.inf)
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding: np.ndarray, namespace: str) -> Tuple[float, Optional[str], Optional[Any]]:
+        """
+        Return (similarity, cached question, cached answer) for the closest live
+        entry in `namespace`. The question and answer are None below the threshold;
+        the similarity is -inf when the namespace has no live entries.
+        """
+        embedding = normalize_rows(embedding).reshape(-1)
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return float("-inf"), None, None
+            live = (self._namespaces == namespace) & (self._expires_at >= time.monotonic())
+            scores = np.where(live, self._vectors @ embedding, -np.inf)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return similarity, None, None
+            self.hits += 1
+            return similarity, self._queries[best], self._answers[best]
+
+    def put(self, embedding: np.ndarray, namespace: str, query: str, answer: Any):
+        """Remember an answer, replacing the oldest entry when the cache is full."""
+        embedding = normalize_rows(embedding).reshape(-1)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else np.inf
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(embedding)), dtype=np.float32)
+            slot = self._next
+            self._vectors[slot] = embedding
+            self._namespaces[slot] = namespace
+            self._queries[slot] = query
+            self._answers[slot] = answer
+            self._expires_at[slot] = expires_at
+            self._next = (slot + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._namespaces[:] = None
+            self._queries = [None] * self.max_entries
+            self._answers = [None] * self.max_entries
+            self._expires_at[:] = -np.inf
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": int((self._expires_at >= time.monotonic()).sum()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,60 @@
+import logging
+import time
+from datetime import date
+from typing import Optional
+from sqlalchemy import func, select, delete, insert
+from sqlalchemy.orm import Session
+from ..models.waste_models import WasteRecord, WasteDailyStats
+
+logging.basicConfig(level=logging.INFO)
+
+
+def stats_query(date_from: Optional[date] = None, date_to: Optional[date] = None, daily: bool = False):
+    """
+    Totals per category (and per day when `daily`) between two days, inclusive.
+
+    Only the rollup table is read: one row per category per day, however
+    many waste records those days hold.
+    """
+    columns = [WasteDailyStats.waste_category]
+    if daily:
+        columns.insert(0, WasteDailyStats.day)
+    stmt = select(
+        *columns,
+        func.sum(WasteDailyStats.record_count).label("count"),
+        func.sum(WasteDailyStats.total_weight).label("total_weight"),
+    )
+    if date_from:
+        stmt = stmt.where(WasteDailyStats.day >= date_from)
+    if date_to:
+        stmt = stmt.where(WasteDailyStats.day <= date_to)
+    stmt = stmt.group_by(*columns).having(func.sum(WasteDailyStats.record_count) > 0)
+    return stmt.order_by(*columns)
+
+
+def rebuild_waste_stats(db: Session) -> int:
+    """
+    Recompute the whole rollup from the raw waste records; returns the number of rollup rows.
+
+    Days are the UTC dates of created_at, which every writer stores as naive
+    UTC (datetime.utcnow() in the application, the utc_now() server default
+    for raw inserts).
+    """
+    start_time = time.time()
+    day = func.date(WasteRecord.created_at)
+    db.execute(delete(WasteDailyStats))
+    db.execute(insert(WasteDailyStats).from_select(
+        ["day", "waste_category", "record_count", "total_weight"],
+        select(
+            day,
+            WasteRecord.waste_category,
+            func.count(),
+            func.coalesce(func.sum(WasteRecord.estimated_weight), 0.0),
+        )
+        .where(WasteRecord.created_at.isnot(None))
+        .group_by(day, WasteRecord.waste_category),
+    ))
+    db.commit()
+    rows = db.scalar(select(func.count()).select_from(WasteDailyStats))
+    logging.info(f"Waste statistics rebuilt into {rows} rollup rows in {time.time() - start_time:.3f} seconds")
+    return rows
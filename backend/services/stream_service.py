@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+from fastapi import HTTPException, WebSocket
+from sqlalchemy.orm import Session
+from ..config.db_config import SessionLocal, settings
+from . import classification_service
+from .inference_executor import inference_executor, ExecutorSaturatedError
+from .tracking_service import IoUTracker
+
+logging.basicConfig(level=logging.INFO)
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+
+
+class StreamSession:
+    """
+    State of one camera or video stream: frame sampling, object tracks and running totals.
+
+    Every sampled frame is run through the detector and fed to an IoU tracker;
+    each physical item is enriched and counted once, when its track is
+    confirmed, instead of on every frame it appears in. Enrichment opens a
+    short-lived session per frame, so a long-running stream never holds a
+    pooled connection (or an open transaction) between frames.
+    """
+
+    def __init__(
+        self,
+        sample_fps: float = 5.0,
+        source_fps: Optional[float] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.session_factory = session_factory
+        self.sample_interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        # With a known source frame rate, sample by frame index instead of wall-clock time
+        self.frame_step = max(1, round(source_fps / sample_fps)) if source_fps and sample_fps > 0 else None
+        self.tracker = IoUTracker(
+            iou_threshold=settings.STREAM_TRACK_IOU,
+            max_age=settings.STREAM_TRACK_MAX_AGE,
+            min_hits=settings.STREAM_TRACK_MIN_HITS,
+        )
+
+        self.counts: Dict[str, int] = {}
+        self.weights: Dict[str, float] = {}
+        self.model_version: Optional[str] = None
+        self.frames_received = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self._last_sampled: Optional[float] = None
+
+    def should_sample(self) -> bool:
+        """Decide whether the frame just received is worth running through the detector."""
+        if self.frame_step is not None:
+            return (self.frames_received - 1) % self.frame_step == 0
+        now = time.monotonic()
+        if self._last_sampled is not None and now - self._last_sampled < self.sample_interval:
+            return False
+        self._last_sampled = now
+        return True
+
+    def process_frame(self, image_bytes: bytes) -> list:
+        """Detect, track and enrich one frame; return the events it produced."""
+        result = classification_service.detect_objects(image_bytes)
+        self.model_version = result["model_version"]
+        frame_index = self.frames_processed
+        self.frames_processed += 1
+
+        confirmed = self.tracker.update(frame_index, result["detections"])
+        if not confirmed:
+            return []
+
+        events = []
+        with self.session_factory() as db:
+            for track in confirmed:
+                item = classification_service.enrich_detections({track.name: {"confidence": track.confidence}}, db)[0]
+                name = item["waste_name"]
+                self.counts[name] = self.counts.get(name, 0) + 1
+                self.weights[name] = self.weights.get(name, 0.0) + (item["estimated_weight"] or 0.0)
+                events.append({"type": "item", "track_id": track.track_id, "frame": track.first_frame, **item})
+        events.append(self.summary())
+        return events
+
+    def summary(self, final: bool = False) -> dict:
+        return {
+            "type": "final_summary" if final else "summary",
+            "model_version": self.model_version,
+            "counts": dict(self.counts),
+            "weights": dict(self.weights),
+            "total_items": sum(self.counts.values()),
+            "total_estimated_weight": sum(self.weights.values()),
+            "frames_received": self.frames_received,
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+async def run_stream(frames: AsyncIterator[bytes], session: StreamSession, live: bool = True) -> AsyncIterator[dict]:
+    """
+    Classify a stream of encoded frames and yield tracking events.
+
+    Frames are read concurrently with inference. In live mode only the newest
+    sampled frame waits for the detector, so when inference falls behind older
+    frames are dropped rather than queued. Otherwise (a recorded upload) the
+    reader simply waits for the detector.
+    """
+    slot: asyncio.Queue = asyncio.Queue(maxsize=1)
+    end_of_stream = object()
+
+    async def produce():
+        try:
+            async for frame in frames:
+                session.frames_received += 1
+                if not session.should_sample():
+                    session.frames_skipped += 1
+                    continue
+                if live and slot.full():
+                    slot.get_nowait()
+                    session.frames_dropped += 1
+                await slot.put(frame)
+        except Exception as e:
+            logging.info(f"Frame source closed: {e}")
+        finally:
+            await slot.put(end_of_stream)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            frame = await slot.get()
+            if frame is end_of_stream:
+                break
+            try:
+                events = await inference_executor.run(session.process_frame, frame)
+            except ExecutorSaturatedError:
+                session.frames_dropped += 1
+                continue
+            except HTTPException as e:
+                yield {"type": "error", "frame": session.frames_received, "error": e.detail}
+                continue
+            for event in events:
+                yield event
+
+        yield session.summary(final=True)
+    finally:
+        producer.cancel()
+
+
+def find_jpeg_end(buffer: bytearray, start: int) -> int:
+    """
+    Return the offset just past the EOI marker of the JPEG that starts at
+    `start`, or -1 while the frame is still incomplete.
+
+    Marker segments are skipped by their length rather than searching for
+    the first EOI, since an APP1 segment (an EXIF thumbnail) can hold a whole
+    JPEG of its own.
+    """
+    pos = start + 2
+    size = len(buffer)
+    while pos + 2 <= size:
+        if buffer[pos] != 0xFF:
+            # Not at a marker, so the stream is not well-formed: fall back to the first EOI
+            end = buffer.find(JPEG_EOI, pos)
+            return end + 2 if end >= 0 else -1
+        marker = buffer[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker == 0xD9:  # EOI
+            return pos + 2
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Markers without a length
+            pos += 2
+            continue
+        if pos + 4 > size:
+            return -1
+        pos += 2 + ((buffer[pos + 2] << 8) | buffer[pos + 3])
+        if marker == 0xDA:
+            # Entropy-coded data runs until a marker other than a stuffed 0xFF00 or a restart marker
+            while True:
+                pos = buffer.find(b"\xff", pos)
+                if pos < 0 or pos + 2 > size:
+                    return -1
+                following = buffer[pos + 1]
+                if following != 0x00 and not 0xD0 <= following <= 0xD7:
+                    break
+                pos += 2
+    return -1
+
+
+async def iter_mjpeg_frames(chunks: AsyncIterator[bytes], max_frame_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Split a chunked MJPEG body into individual JPEG frames.
+
+    Works for raw concatenated JPEGs as well as multipart/x-mixed-replace
+    streams, since part boundaries and headers between frames are skipped.
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        while True:
+            start = buffer.find(JPEG_SOI)
+            if start < 0:
+                del buffer[:-1]  # Keep a trailing 0xFF in case the marker is split across chunks
+                break
+            end = find_jpeg_end(buffer, start)
+            if end < 0:
+                if start > 0:
+                    del buffer[:start]
+                if len(buffer) > max_frame_bytes:
+                    logging.warning("Discarding oversized MJPEG frame.")
+                    buffer.clear()
+                break
+            yield bytes(buffer[start:end])
+            del buffer[:end]
+
+
+async def iter_file_chunks(fileobj, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """Read a (possibly disk-backed) file in chunks without blocking the event loop."""
+    while True:
+        chunk = await asyncio.to_thread(fileobj.read, chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def iter_websocket_frames(websocket: WebSocket) -> AsyncIterator[bytes]:
+    """Yield binary frames sent by a WebSocket client until it disconnects."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        data = message.get("bytes")
+        if data:
+            yield data
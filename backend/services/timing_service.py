@@ -0,0 +1,236 @@
+import asyncio
+import collections
+import contextvars
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+logging.basicConfig(level=logging.INFO)
+
+
+class RequestTimings:
+    """
+    Stage durations of one request, plus its stack samples when it is being profiled.
+
+    Stages can run on the event loop, on an executor worker or on a batcher
+    thread; each thread registers itself while it works on the request so the
+    sampler knows whose stacks to collect.
+    """
+
+    def __init__(self, profile: bool = False):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.samples: Optional[collections.Counter] = collections.Counter() if profile else None
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def enter_thread(self):
+        if self.samples is None:
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def exit_thread(self):
+        if self.samples is None:
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            remaining = self._threads.get(thread_id, 0) - 1
+            if remaining > 0:
+                self._threads[thread_id] = remaining
+            else:
+                self._threads.pop(thread_id, None)
+
+    def threads(self) -> list:
+        with self._lock:
+            return list(self._threads)
+
+    def server_timing(self) -> str:
+        """Render the stages as a Server-Timing header value."""
+        with self._lock:
+            stages = list(self.stages.items())
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a named stage of the current request (no-op outside timed requests)."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    timings.enter_thread()
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.record(name, time.perf_counter() - start_time)
+        timings.exit_thread()
+
+
+def record_since_start(name: str):
+    """Record the time from the start of the current request until now as a stage."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.record(name, timings.elapsed())
+
+
+@contextmanager
+def working_for(requests: Iterable[Optional[RequestTimings]]) -> Iterator[None]:
+    """Attribute the current thread to several requests at once, e.g. a batcher running a shared batch."""
+    profiled = [timings for timings in requests if timings is not None and timings.samples is not None]
+    for timings in profiled:
+        timings.enter_thread()
+    try:
+        yield
+    finally:
+        for timings in profiled:
+            timings.exit_thread()
+
+
+def fold_stack(frame) -> str:
+    """Render a frame and its callers in the collapsed format read by flamegraph.pl and speedscope."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """
+    Background thread sampling the stacks of threads working on profiled requests.
+
+    It only wakes up while at least one profiled request is in flight and
+    walks just the threads registered by those requests.
+    """
+
+    def __init__(self, interval_ms: float = 5.0):
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self._active: set = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, timings: RequestTimings):
+        with self._lock:
+            self._active.add(timings)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def discard(self, timings: RequestTimings):
+        with self._lock:
+            self._active.discard(timings)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wakeup.clear()
+            if not active:
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            folded: Dict[int, str] = {}
+            for timings in active:
+                for thread_id in timings.threads():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own_id:
+                        continue
+                    if thread_id not in folded:
+                        folded[thread_id] = fold_stack(frame)
+                    timings.samples[folded[thread_id]] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with per-stage durations.
+
+    Only requests to `paths` are timed. Services mark stages with `stage()`.
+    When profiling is on, every `sample_every`-th request, and any request
+    slower than `slow_ms`, has its sampled stacks written to `profile_dir` as
+    a collapsed-stack file ready for a flame graph.
+    """
+
+    def __init__(self, app, paths: Sequence[str], sample_every: int = 0, slow_ms: float = 0,
+                 profile_dir: str = "profiles", interval_ms: float = 5.0):
+        self.app = app
+        self.paths = {path.strip() for path in paths if path.strip()}
+        self.sample_every = max(0, int(sample_every))
+        self.slow_ms = max(0.0, float(slow_ms))
+        self.profile_dir = profile_dir
+        self.sampler = StackSampler(interval_ms) if self.sample_every or self.slow_ms else None
+        self._counter = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        sampled = bool(self.sample_every) and next(self._counter) % self.sample_every == 0
+        # A request can only turn out to be slow after the fact, so with a threshold every request is sampled
+        timings = RequestTimings(profile=sampled or bool(self.slow_ms))
+        token = _current_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*"))  # Lets the cross-origin frontend read the timings
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if timings.samples is not None:
+            self.sampler.add(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            if timings.samples is not None:
+                self.sampler.discard(timings)
+                elapsed_ms = timings.elapsed() * 1000
+                if sampled or (self.slow_ms and elapsed_ms >= self.slow_ms):
+                    await asyncio.to_thread(self._write_profile, scope["path"], timings, elapsed_ms)
+
+    def _write_profile(self, path: str, timings: RequestTimings, elapsed_ms: float):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            slug = path.strip("/").replace("/", "_") or "root"
+            filename = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{slug}-{elapsed_ms:.0f}ms.folded"
+            with open(os.path.join(self.profile_dir, filename), "w") as f:
+                for stack, count in timings.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            logging.info(f"Wrote request profile {filename} ({sum(timings.samples.values())} samples)")
+        except Exception as e:
+            logging.error(f"Could not write request profile: {e}")
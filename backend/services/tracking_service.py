@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# (class name, confidence, [x1, y1, x2, y2])
+Detection = Tuple[str, float, Sequence[float]]
+
+
+def box_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+@dataclass
+class Track:
+    track_id: int
+    name: str
+    box: Sequence[float]
+    confidence: float
+    first_frame: int
+    last_frame: int
+    hits: int = 1
+    counted: bool = False
+
+
+class IoUTracker:
+    """
+    Greedy IoU tracker that follows objects of the same class across frames.
+
+    A detection continues the track of the same class whose last box overlaps
+    it most (above `iou_threshold`); otherwise it starts a new track. A track
+    is confirmed, and reported exactly once, after `min_hits` matched frames,
+    and forgotten after `max_age` processed frames without a match.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 10, min_hits: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = max(1, min_hits)
+        self.tracks: Dict[int, Track] = {}
+        self._next_id = 1
+
+    def update(self, frame_index: int, detections: List[Detection]) -> List[Track]:
+        """Associate one frame's detections and return tracks confirmed by this frame."""
+        candidates = []
+        for det_index, (name, _, box) in enumerate(detections):
+            for track in self.tracks.values():
+                if track.name != name:
+                    continue
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    candidates.append((iou, det_index, track.track_id))
+        candidates.sort(reverse=True)
+
+        matched_detections, matched_tracks = set(), set()
+        newly_confirmed = []
+        for _, det_index, track_id in candidates:
+            if det_index in matched_detections or track_id in matched_tracks:
+                continue
+            matched_detections.add(det_index)
+            matched_tracks.add(track_id)
+
+            _, confidence, box = detections[det_index]
+            track = self.tracks[track_id]
+            track.box = box
+            track.confidence = max(track.confidence, confidence)
+            track.last_frame = frame_index
+            track.hits += 1
+            if not track.counted and track.hits >= self.min_hits:
+                track.counted = True
+                newly_confirmed.append(track)
+
+        for det_index, (name, confidence, box) in enumerate(detections):
+            if det_index in matched_detections:
+                continue
+            track = Track(self._next_id, name, box, confidence, frame_index, frame_index)
+            self._next_id += 1
+            self.tracks[track.track_id] = track
+            if self.min_hits <= 1:
+                track.counted = True
+                newly_confirmed.append(track)
+
+        expired = [tid for tid, t in self.tracks.items() if frame_index - t.last_frame > self.max_age]
+        for track_id in expired:
+            del self.tracks[track_id]
+
+        return newly_confirmed
@@ -0,0 +1,8 @@
+import re
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_waste_name(name: str) -> str:
+    """Normalize a YOLO class label or waste type name into a lookup key (casefolded, punctuation stripped)."""
+    return _SEPARATORS.sub(" ", name.casefold()).strip()